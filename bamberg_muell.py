@@ -1,16 +1,44 @@
 #!/usr/bin/env python3
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from html.parser import HTMLParser
-from collections import Counter
+from bisect import bisect_left
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 import threading
+import argparse
 import json
+import mmap
+import struct
+import codecs
+import random
+import re
+import csv
+import sys
 import os
+import time
 
 API_URL = "https://ebbweb.stadt.bamberg.de/WasteManagementBamberg/WasteManagementServlet"
 HISTORY_FILE = "history.json"
+ABFALLARTEN_FILE = "abfallarten.json"  # eigene abfallarten, farben und icons
+CACHE_FILE = "termine.snap"
+SNAPSHOT_MAGIC = b"BMSN"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COMPACT = 200  # log-einträge, danach wird die datei neu geschrieben
+CACHE_TTL = 7 * 24 * 3600  # sekunden, danach wird im hintergrund neu geladen
+CACHE_MAX = 50
+SERVICE_URL = os.environ.get("BAMBERG_MUELL_SERVICE")  # z.B. http://server:8080, sonst direkt zur stadt
+TRACE_FILE = os.environ.get("BAMBERG_MUELL_TRACE")  # json-lines-datei für zeitmessungen pro phase
+TIMEOUT = (3.05, 20.0)  # sekunden für verbindungsaufbau und lesen
+TIMEOUT_MIN = 2.0  # untergrenze des an die antwortzeiten angepassten lese-timeouts
+RETRIES = 2
+BACKOFF = 0.5  # sekunden, verdoppelt sich pro versuch, davon ein zufälliger anteil
+BREAKER_FEHLER = 5  # aufeinanderfolgende fehler, nach denen der server gesperrt wird
+BREAKER_PAUSE = 60  # sekunden ohne anfragen, danach darf ein probeversuch durch
 
 class HiddenInputParser(HTMLParser):
     def __init__(self):
@@ -27,493 +55,1601 @@ class HiddenInputParser(HTMLParser):
             if str(d.get("type", "")).lower() == "hidden":
                 self._args[d["name"]] = d.get("value", "")
 
-def get_termine(street, house_number, address_suffix=""):
-    session = requests.session()
-    
-    r = session.get(
-        API_URL,
-        params={"SubmitAction": "wasteDisposalServices", "InFrameMode": "TRUE"},
-    )
-    r.raise_for_status()
-    r.encoding = "utf-8"
-    
-    parser = HiddenInputParser()
-    parser.feed(r.text)
-    args = parser.args
-    
-    args["Ort"] = street[0].upper()
-    args["Strasse"] = street
-    args["Hausnummer"] = str(house_number)
-    args["Hausnummerzusatz"] = address_suffix
-    args["SubmitAction"] = "CITYCHANGED"
-    
-    r = session.post(API_URL, data=args)
-    r.raise_for_status()
-    
-    args["SubmitAction"] = "forward"
-    for i in range(1, 10):
-        args[f"ContainerGewaehlt_{i}"] = "on"
-    
-    r = session.post(API_URL, data=args)
-    r.raise_for_status()
-    
-    args["ApplicationName"] = "com.athos.nl.mvc.abfterm.AbfuhrTerminModel"
-    args["SubmitAction"] = "filedownload_ICAL"
-    
-    r = session.post(API_URL, data=args)
-    r.raise_for_status()
-    
-    termine = []
-    current_date = None
-    current_date_sort = None
-    
-    for line in r.text.split('\n'):
-        if line.startswith('DTSTART'):
-            date = line.split(':')[1]
-            current_date = f"{date[6:8]}.{date[4:6]}.{date[0:4]}"
-            current_date_sort = date
-        elif line.startswith('SUMMARY') and current_date:
-            desc = line.split(':')[1].strip()
-            termine.append((current_date_sort, current_date, desc))
-            current_date = None
-            current_date_sort = None
-    
-    termine.sort(key=lambda x: (x[0], x[2]))
-    return [(datum, typ) for _, datum, typ in termine]
-
-class SplashScreen:
-    def __init__(self, parent):
-        self.splash = tk.Toplevel()
-        self.splash.title("Bamberg Abfuhrtermine")
-        self.splash.overrideredirect(True)
-        
-        frame = tk.Frame(self.splash, bg="#2196F3", padx=60, pady=40)
-        frame.pack()
-        
-        title = tk.Label(frame, text="🗑️ Bamberg Abfuhrtermine", 
-                        font=("Arial", 24, "bold"), bg="#2196F3", fg="white")
-        title.pack(pady=(0, 20))
-        
-        subtitle = tk.Label(frame, text="Abfuhrkalender für die Stadt Bamberg", 
-                           font=("Arial", 12), bg="#2196F3", fg="white")
-        subtitle.pack(pady=(0, 30))
-        
-        loading = tk.Label(frame, text="Wird geladen...", 
-                          font=("Arial", 11), bg="#2196F3", fg="white")
-        loading.pack(pady=(0, 20))
-        
-        author = tk.Label(frame, text="Entwickelt von Oliver Schlegel", 
-                         font=("Arial", 9), bg="#2196F3", fg="#E3F2FD")
-        author.pack()
-        
-        self.splash.update_idletasks()
-        x = (self.splash.winfo_screenwidth() // 2) - (self.splash.winfo_width() // 2)
-        y = (self.splash.winfo_screenheight() // 2) - (self.splash.winfo_height() // 2)
-        self.splash.geometry(f"+{x}+{y}")
-        
-        self.splash.after(3000, self.close)
-    
-    def close(self):
-        self.splash.destroy()
-
-class AbfallApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Bamberg Abfuhrtermine")
-        self.root.geometry("900x650")
-        self.history = self.load_history()
-        self.current_termine = []
-        self.dark_mode = False
-        
-        # menubar
-        menubar = tk.Menu(root)
-        root.config(menu=menubar)
-        
-        file_menu = tk.Menu(menubar, tearoff=0)
-        menubar.add_cascade(label="Datei", menu=file_menu)
-        file_menu.add_command(label="📄 Drucken", command=self.drucken)
-        file_menu.add_separator()
-        file_menu.add_command(label="Beenden", command=root.quit)
-        
-        view_menu = tk.Menu(menubar, tearoff=0)
-        menubar.add_cascade(label="Ansicht", menu=view_menu)
-        view_menu.add_command(label="🌙 Dark Mode", command=self.toggle_dark_mode)
-        view_menu.add_command(label="📊 Statistik", command=self.zeige_statistik)
-        
-        self.build_ui()
-    
-    def get_colors(self):
-        if self.dark_mode:
-            return {
-                'bg': '#1e1e1e', 'card': '#2d2d2d', 'primary': '#64B5F6',
-                'primary_dark': '#42A5F5', 'text': '#e0e0e0', 'text_secondary': '#b0b0b0',
-                'header': '#424242', 'status_bg': '#2d2d2d', 'input_bg': '#3d3d3d',
-                'list_select': '#1976D2', 'border': '#404040'
-            }
+class FormRejected(Exception):
+    pass
+
+class KeinKalender(ValueError):
+    pass
+
+class CircuitOpen(requests.RequestException):
+    # der server ist nach zu vielen fehlern vorübergehend gesperrt
+    pass
+
+class VeralteteTermine(requests.RequestException):
+    # der dienst erreicht die stadt nicht und liefert seinen letzten stand
+    def __init__(self, termine, stand):
+        super().__init__(f"Server nicht erreichbar, Stand vom {datetime.fromtimestamp(stand):%d.%m.%Y %H:%M}")
+        self.termine = termine
+        self.stand = stand
+
+SYNC_FENSTER = 7  # tage, bis zu denen ein termin als verschoben statt neu gilt
+
+RRULE_HORIZON = 2 * 366  # tage, begrenzt regeln ohne COUNT/UNTIL
+RRULE_GRENZE = 100 * 366  # tage, nur gegen endlosschleifen bei COUNT ohne passende tage
+
+def _ical_date(value):
+    # 20250106, 20250106T070000 oder 20250106T070000Z -> nur das datum zählt
+    return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+def _ical_unescape(value):
+    if '\\' not in value:
+        return value
+    return re.sub(r'\\([\\;,nN])', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+def _split_property(line):
+    # NAME;PARAM=WERT;PARAM="a:b":WERT  (doppelpunkte in quotes gehören zum parameter)
+    i = line.find(':')
+    if i < 0:
+        return None
+    if '"' in line[:i]:
+        quoted = False
+        for i, ch in enumerate(line):
+            if ch == '"':
+                quoted = not quoted
+            elif ch == ':' and not quoted:
+                break
         else:
-            return {
-                'bg': '#fafafa', 'card': 'white', 'primary': '#2196F3',
-                'primary_dark': '#1976D2', 'text': '#333', 'text_secondary': '#666',
-                'header': '#f5f5f5', 'status_bg': '#f5f5f5', 'input_bg': 'white',
-                'list_select': '#E3F2FD', 'border': '#ddd'
-            }
-    
-    def build_ui(self):
-        c = self.get_colors()
-        
-        # clear old widgets
-        for widget in self.root.winfo_children():
-            if not isinstance(widget, tk.Menu):
-                widget.destroy()
-        
-        main_frame = tk.Frame(self.root, bg=c['bg'])
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
-        
-        # left panel
-        left_panel = tk.Frame(main_frame, bg=c['bg'], width=300)
-        left_panel.pack(side=tk.LEFT, fill=tk.BOTH, padx=(0, 10))
-        left_panel.pack_propagate(False)
-        
-        # input card
-        input_card = tk.Frame(left_panel, bg=c['card'], relief='solid', bd=1, highlightbackground=c['border'], highlightthickness=1)
-        input_card.pack(fill=tk.X, pady=(0, 15))
-        
-        title_frame = tk.Frame(input_card, bg=c['primary'], height=45)
-        title_frame.pack(fill=tk.X)
-        title_label = tk.Label(title_frame, text="🏠 Adresse eingeben", 
-                              font=('Segoe UI', 11, 'bold'), 
-                              bg=c['primary'], fg='white', anchor='w')
-        title_label.pack(side=tk.LEFT, padx=15, pady=10)
-        
-        fields_frame = tk.Frame(input_card, bg=c['card'], padx=15, pady=15)
-        fields_frame.pack(fill=tk.BOTH)
-        
-        tk.Label(fields_frame, text="Straße", font=('Segoe UI', 9), 
-                bg=c['card'], fg=c['text_secondary']).pack(anchor='w', pady=(0, 5))
-        self.strasse_entry = tk.Entry(fields_frame, font=('Segoe UI', 10), 
-                                      relief='solid', bd=1, bg=c['input_bg'], fg=c['text'])
-        self.strasse_entry.pack(fill=tk.X, ipady=6, pady=(0, 15))
-        
-        tk.Label(fields_frame, text="Hausnummer", font=('Segoe UI', 9), 
-                bg=c['card'], fg=c['text_secondary']).pack(anchor='w', pady=(0, 5))
-        self.hnr_entry = tk.Entry(fields_frame, font=('Segoe UI', 10), 
-                                  relief='solid', bd=1, bg=c['input_bg'], fg=c['text'])
-        self.hnr_entry.pack(fill=tk.X, ipady=6, pady=(0, 15))
-        
-        tk.Label(fields_frame, text="Zusatz (optional)", font=('Segoe UI', 9), 
-                bg=c['card'], fg=c['text_secondary']).pack(anchor='w', pady=(0, 5))
-        self.zusatz_entry = tk.Entry(fields_frame, font=('Segoe UI', 10), 
-                                     relief='solid', bd=1, bg=c['input_bg'], fg=c['text'])
-        self.zusatz_entry.pack(fill=tk.X, ipady=6, pady=(0, 15))
-        
-        self.suchen_btn = tk.Button(fields_frame, text="🔍  Termine abrufen", 
-                                    command=self.suchen,
-                                    font=('Segoe UI', 10, 'bold'),
-                                    bg=c['primary'], fg='white',
-                                    relief='flat', cursor='hand2',
-                                    padx=20, pady=10)
-        self.suchen_btn.pack(fill=tk.X)
-        self.suchen_btn.bind('<Enter>', lambda e: self.suchen_btn.config(bg=c['primary_dark']))
-        self.suchen_btn.bind('<Leave>', lambda e: self.suchen_btn.config(bg=c['primary']))
-        
-        # history card
-        history_card = tk.Frame(left_panel, bg=c['card'], relief='solid', bd=1, highlightbackground=c['border'], highlightthickness=1)
-        history_card.pack(fill=tk.BOTH, expand=True)
-        
-        history_title_frame = tk.Frame(history_card, bg=c['header'], height=40)
-        history_title_frame.pack(fill=tk.X)
-        history_title = tk.Label(history_title_frame, text="📋 Letzte Anfragen", 
-                                font=('Segoe UI', 10, 'bold'),
-                                bg=c['header'], fg=c['text'], anchor='w')
-        history_title.pack(side=tk.LEFT, padx=15, pady=10)
-        
-        history_list_frame = tk.Frame(history_card, bg=c['card'])
-        history_list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        self.history_listbox = tk.Listbox(history_list_frame, 
-                                         font=('Segoe UI', 9),
-                                         relief='flat',
-                                         highlightthickness=0,
-                                         selectbackground=c['list_select'],
-                                         selectforeground=c['primary_dark'],
-                                         bg=c['card'], fg=c['text'])
-        self.history_listbox.pack(fill=tk.BOTH, expand=True)
-        self.history_listbox.bind('<Double-Button-1>', self.load_from_history)
-        
-        self.update_history_list()
-        
-        # right panel
-        right_panel = tk.Frame(main_frame, bg=c['card'], relief='solid', bd=1, highlightbackground=c['border'], highlightthickness=1)
-        right_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        result_header = tk.Frame(right_panel, bg=c['header'], height=45)
-        result_header.pack(fill=tk.X)
-        result_title = tk.Label(result_header, text="📅 Abfuhrtermine", 
-                               font=('Segoe UI', 11, 'bold'),
-                               bg=c['header'], fg=c['text'], anchor='w')
-        result_title.pack(side=tk.LEFT, padx=15, pady=10)
-        
-        table_frame = tk.Frame(right_panel, bg=c['card'])
-        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        style = ttk.Style()
-        style.theme_use('clam')
-        style.configure('Custom.Treeview', 
-                       font=('Segoe UI', 9),
-                       rowheight=30,
-                       background=c['card'],
-                       fieldbackground=c['card'],
-                       foreground=c['text'])
-        style.configure('Custom.Treeview.Heading',
-                       font=('Segoe UI', 10, 'bold'),
-                       background=c['header'],
-                       foreground=c['text'])
-        
-        self.tree = ttk.Treeview(table_frame, 
-                                columns=("datum", "typ"), 
-                                show="headings",
-                                style='Custom.Treeview')
-        self.tree.heading("datum", text="📅 Datum")
-        self.tree.heading("typ", text="🗑️ Abfallart")
-        self.tree.column("datum", width=120, anchor='center')
-        self.tree.column("typ", width=400)
-        
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
-        
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # colors for waste types
-        self.tree.tag_configure('restmuell', background='#e0e0e0' if not self.dark_mode else '#424242', foreground='#000' if not self.dark_mode else '#e0e0e0')
-        self.tree.tag_configure('biomuell', background='#d7ccc8' if not self.dark_mode else '#5d4037')
-        self.tree.tag_configure('papier', background='#e3f2fd' if not self.dark_mode else '#1565c0')
-        self.tree.tag_configure('gelb', background='#fff9c4' if not self.dark_mode else '#f9a825')
-        
-        # status bar
-        status_frame = tk.Frame(self.root, bg=c['status_bg'], height=35)
-        status_frame.pack(fill=tk.X, side=tk.BOTTOM)
-        
-        self.status = tk.Label(status_frame, text="Bereit", 
-                              font=('Segoe UI', 9),
-                              bg=c['status_bg'], fg=c['text_secondary'],
-                              anchor='w')
-        self.status.pack(side=tk.LEFT, padx=15, pady=8)
-        
-        # reload termine if available
-        if self.current_termine:
-            self.zeige_termine(self.current_termine)
+            return None
+    head, value = line[:i], line[i + 1:]
+    if ';' not in head:
+        return head.upper(), {}, value
+    name, *params = head.split(';')
+    return name.upper(), dict(p.split('=', 1) for p in params if '=' in p), value
+
+def _add_months(d, months):
+    month = d.month - 1 + months
+    year = d.year + month // 12
+    month = month % 12 + 1
+    try:
+        return d.replace(year=year, month=month)
+    except ValueError:
+        return None  # z.B. 31. im februar, wird laut RFC 5545 übersprungen
+
+WOCHENTAG_CODES = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+
+# BY*-teile, die pro FREQ ausgewertet werden. regeln mit anderen BY*-teilen
+# (BYSETPOS, BYMONTH, ...) werden wie eine unbekannte FREQ behandelt
+RRULE_BY = {'DAILY': set(), 'WEEKLY': {'BYDAY'}, 'MONTHLY': {'BYDAY', 'BYMONTHDAY'}, 'YEARLY': set()}
+
+def _monatstage(erster, byday, bymonthday):
+    # tage eines monats zu BYDAY (auch 1TU, -1FR) und BYMONTHDAY (auch -1),
+    # sind beide angegeben, zählt die schnittmenge
+    laenge = (_add_months(erster, 1) - erster).days
+    mengen = []
+    if bymonthday:
+        tage = set()
+        for n in map(int, bymonthday):
+            tag = n if n > 0 else laenge + n + 1
+            if 1 <= tag <= laenge:
+                tage.add(erster.replace(day=tag))
+        mengen.append(tage)
+    if byday:
+        tage = set()
+        for nr, code in byday:
+            passend = [erster + timedelta(days=k) for k in range((code - erster.weekday()) % 7, laenge, 7)]
+            if not nr:
+                tage.update(passend)
+            elif -len(passend) <= nr <= len(passend):
+                tage.add(passend[nr - 1 if nr > 0 else nr])
+        mengen.append(tage)
+    return sorted(set.intersection(*mengen))
+
+def _perioden(freq, start, interval, byday, bymonthday, wkst):
+    # (periodenbeginn, tage der periode) für periode 0, 1, 2, ...
+    i = 0
+    while True:
+        if freq == 'DAILY':
+            d = start + timedelta(days=i * interval)
+            yield d, [d]
+        elif freq == 'WEEKLY' and byday:
+            woche = start - timedelta(days=(start.weekday() - wkst) % 7) + timedelta(weeks=i * interval)
+            yield woche, sorted({woche + timedelta(days=(code - wkst) % 7) for _, code in byday})
+        elif freq == 'WEEKLY':
+            d = start + timedelta(weeks=i * interval)
+            yield d, [d]
+        elif freq == 'MONTHLY' and (byday or bymonthday):
+            erster = _add_months(start.replace(day=1), i * interval)
+            yield erster, _monatstage(erster, byday, bymonthday)
+        elif freq == 'MONTHLY':
+            d = _add_months(start, i * interval)
+            yield start if d is None else d, [] if d is None else [d]
+        else:
+            d = _add_months(start, 12 * i * interval)
+            yield start if d is None else d, [] if d is None else [d]
+        i += 1
+
+def _expand_rrule(start, rule, exdates):
+    parts = {k.upper(): v for k, v in (p.split('=', 1) for p in rule.split(';') if '=' in p)}
+    freq = parts.get('FREQ', '').upper()
+    interval = int(parts.get('INTERVAL', 1))
+    count = int(parts['COUNT']) if 'COUNT' in parts else None
+    if 'UNTIL' in parts:
+        until = _ical_date(parts['UNTIL'])
+    else:
+        until = start + timedelta(days=RRULE_GRENZE if count is not None else RRULE_HORIZON)
+    by = {k for k in parts if k.startswith('BY')}
+    byday = []
+    for teil in parts.get('BYDAY', '').upper().split(','):
+        m = re.fullmatch(r'([+-]?\d*)(MO|TU|WE|TH|FR|SA|SU)', teil.strip())
+        if m:
+            byday.append((int(m.group(1) or 0), WOCHENTAG_CODES[m.group(2)]))
     
-    def load_history(self):
-        if os.path.exists(HISTORY_FILE):
-            try:
-                with open(HISTORY_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-    
-    def save_history(self):
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(self.history[-10:], f)
-    
-    def update_history_list(self):
-        self.history_listbox.delete(0, tk.END)
-        for entry in reversed(self.history[-10:]):
-            text = f"{entry['strasse']} {entry['hnr']}{entry['zusatz']}"
-            self.history_listbox.insert(tk.END, text)
-    
-    def load_from_history(self, event):
-        selection = self.history_listbox.curselection()
-        if selection:
-            idx = len(self.history) - 1 - selection[0]
-            if 0 <= idx < len(self.history):
-                entry = self.history[idx]
-                self.strasse_entry.delete(0, tk.END)
-                self.strasse_entry.insert(0, entry['strasse'])
-                self.hnr_entry.delete(0, tk.END)
-                self.hnr_entry.insert(0, entry['hnr'])
-                self.zusatz_entry.delete(0, tk.END)
-                self.zusatz_entry.insert(0, entry['zusatz'])
-                self.suchen()
-    
-    def suchen(self):
-        strasse = self.strasse_entry.get().strip()
-        hnr = self.hnr_entry.get().strip()
-        zusatz = self.zusatz_entry.get().strip()
-        
-        if not strasse or not hnr:
-            messagebox.showerror("Fehler", "Bitte Straße und Hausnummer eingeben")
+    if (freq not in RRULE_BY or not by <= RRULE_BY[freq] or interval < 1
+            or ('BYDAY' in parts and len(byday) != len(parts['BYDAY'].split(',')))
+            or (freq == 'WEEKLY' and any(nr for nr, _ in byday))):
+        # unbekannte regel: nur den ersten termin übernehmen statt falscher tage
+        print(f"RRULE nicht unterstützt, nur erster Termin: {rule}", file=sys.stderr)
+        if start not in exdates:
+            yield start
+        return
+    
+    bymonthday = [t for t in parts.get('BYMONTHDAY', '').split(',') if t]
+    wkst = WOCHENTAG_CODES.get(parts.get('WKST', 'MO').upper(), 0)
+    n = 0
+    for beginn, tage in _perioden(freq, start, interval, byday if 'BYDAY' in parts else None,
+                                  bymonthday, wkst):
+        if beginn > until:
             return
-        
+        for d in tage:
+            if d < start:
+                continue
+            if d > until or (count is not None and n >= count):
+                return
+            n += 1
+            if d not in exdates:
+                yield d
+
+def _event_occurrences(props):
+    if 'DTSTART' not in props or 'SUMMARY' not in props:
+        return
+    start = _ical_date(props['DTSTART'])
+    summary = _ical_unescape(props['SUMMARY']).strip()
+    uid = props.get('UID', '')
+    if 'RRULE' in props:
+        exdates = {_ical_date(v) for v in props.get('EXDATE', '').split(',') if v}
+        for d in _expand_rrule(start, props['RRULE'], exdates):
+            yield {'uid': uid, 'datum': d, 'typ': summary}
+    else:
+        yield {'uid': uid, 'datum': start, 'typ': summary}
+
+def iter_ical_events(chunks):
+    # liest ical stückweise (z.B. aus iter_content) und liefert jeden termin,
+    # sobald sein VEVENT abgeschlossen ist. gepuffert wird nur das aktuelle event.
+    buffer = ""
+    logical = None
+    started = False
+    props = None
+    
+    def handle(line):
+        nonlocal started, props
+        parsed = _split_property(line)
+        if parsed is None:
+            return ()
+        name, params, value = parsed
+        if not started:
+            if name != 'BEGIN' or value.strip().upper() != 'VCALENDAR':
+                raise KeinKalender("Antwort ist kein iCal-Kalender")
+            started = True
+        elif name == 'BEGIN' and value.strip().upper() == 'VEVENT':
+            props = {}
+        elif name == 'END' and value.strip().upper() == 'VEVENT' and props is not None:
+            event, props = props, None
+            return _event_occurrences(event)
+        elif props is not None:
+            if name == 'EXDATE' and 'EXDATE' in props:
+                props[name] += ',' + value
+            else:
+                props[name] = value
+        return ()
+    
+    def unfold(lines):
+        nonlocal logical
+        for line in lines:
+            line = line.rstrip('\r')
+            if line[:1] in (' ', '\t') and logical is not None:
+                logical += line[1:]  # gefaltete zeile fortsetzen
+                continue
+            if logical:
+                yield from handle(logical)
+            logical = line
+    
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        yield from unfold(lines)
+    yield from unfold([buffer, ''])
+    if not started:
+        raise KeinKalender("Antwort ist kein iCal-Kalender")
+
+# abfallarten werden global auf kleine codes abgebildet, damit listen vieler
+# adressen denselben string nur einmal halten
+_typ_codes = {}
+_typ_namen = []
+_typ_lock = threading.Lock()
+
+def typ_code(typ):
+    code = _typ_codes.get(typ)
+    if code is None:
+        if _arten is None:
+            lade_abfallarten()
+        with _typ_lock:
+            code = _typ_codes.setdefault(typ, len(_typ_namen))
+            if code == len(_typ_namen):
+                _typ_namen.append(sys.intern(typ))
+                _typ_arten.append(_klassifiziere(typ))
+    return code
+
+def typ_name(code):
+    return _typ_namen[code]
+
+def typ_art(code):
+    return _typ_arten[code]
+
+# kanonische abfallart eines SUMMARY-textes. die zuordnung über muster
+# (teilstrings, ohne groß-/kleinschreibung) läuft einmal pro neuem text in
+# typ_code, danach ist sie ein listenzugriff über den code
+class Abfallart:
+    __slots__ = ('id', 'name', 'muster', 'hell', 'dunkel', 'icon')
+    
+    def __init__(self, id, name, muster=(), hell=None, dunkel=None, icon=""):
+        self.id = id
+        self.name = name
+        self.muster = tuple(m.casefold() for m in muster)
+        self.hell = hell or {}
+        self.dunkel = dunkel or {}
+        self.icon = icon
+    
+    def __repr__(self):
+        return f"Abfallart({self.id!r})"
+
+ABFALLARTEN = [
+    Abfallart('restmuell', "Restmüll", ["Restmüll", "Restmuell", "Restabfall"],
+              {'background': '#e0e0e0', 'foreground': '#000'}, {'background': '#424242', 'foreground': '#e0e0e0'}, "⚫"),
+    Abfallart('biomuell', "Biomüll", ["Bio"], {'background': '#d7ccc8'}, {'background': '#5d4037'}, "🟤"),
+    Abfallart('papier', "Papier", ["Papier"], {'background': '#e3f2fd'}, {'background': '#1565c0'}, "🔵"),
+    Abfallart('gelb', "Gelber Sack", ["Gelb"], {'background': '#fff9c4'}, {'background': '#f9a825'}, "🟡"),
+    Abfallart('problemmuell', "Problemmüll", ["Problem", "Schadstoff"],
+              {'background': '#ffcdd2'}, {'background': '#b71c1c'}, "🔴"),
+    Abfallart('christbaum', "Christbaum", ["Christbaum", "Weihnachtsbaum"],
+              {'background': '#c8e6c9'}, {'background': '#2e7d32'}, "🎄"),
+    Abfallart('sperrmuell', "Sperrmüll", ["Sperr"], {'background': '#ffe0b2'}, {'background': '#e65100'}, "🟠"),
+]
+SONSTIGE = Abfallart('sonstige', "Sonstige", icon="⚪")
+
+_arten = None  # geprüfte arten in reihenfolge, geladen beim ersten typ_code
+_typ_arten = []  # abfallart je typ-code
+
+def _farbe(wert):
+    # "#rrggbb" als hintergrund oder ein dict mit treeview-tag-optionen
+    return {'background': wert} if isinstance(wert, str) else dict(wert)
+
+def lade_abfallarten(path=ABFALLARTEN_FILE):
+    # standardarten plus die aus der datei, z.B.
+    #   [{"id": "sperrmuell", "muster": ["Sperr", "Elektro"], "hell": "#ffe0b2", "icon": "🛋️"},
+    #    {"id": "altglas", "name": "Altglas", "muster": ["Glas"], "hell": "#b2dfdb", "dunkel": "#00695c"}]
+    # einträge mit bekannter id ändern nur die angegebenen felder, alle
+    # einträge der datei werden vor den standardarten geprüft
+    global _arten
+    standard = {a.id: a for a in ABFALLARTEN}
+    eigene = []
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                for eintrag in json.load(f):
+                    muster = eintrag.get('muster', [])
+                    if not isinstance(muster, list) or not all(isinstance(m, str) and m for m in muster):
+                        raise TypeError(f"muster von {eintrag['id']} muss eine Liste nicht-leerer Texte sein")
+                    alt = standard.pop(eintrag['id'], None) or Abfallart(eintrag['id'], eintrag['id'], icon=SONSTIGE.icon)
+                    eigene.append(Abfallart(alt.id, eintrag.get('name', alt.name), eintrag.get('muster', alt.muster),
+                                            _farbe(eintrag['hell']) if 'hell' in eintrag else alt.hell,
+                                            _farbe(eintrag['dunkel']) if 'dunkel' in eintrag else alt.dunkel,
+                                            eintrag.get('icon', alt.icon)))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"{path} ungültig ({e}), verwende Standard-Abfallarten", file=sys.stderr)
+            standard = {a.id: a for a in ABFALLARTEN}
+            eigene = []
+    with _typ_lock:
+        _arten = eigene + list(standard.values())
+        _typ_arten[:] = [_klassifiziere(typ) for typ in _typ_namen]
+    return _arten
+
+def _klassifiziere(typ):
+    text = typ.casefold()
+    for art in _arten:
+        for muster in art.muster:
+            if muster in text:
+                return art
+    return SONSTIGE
+
+def abfallart(typ):
+    return _typ_arten[typ_code(typ)]
+
+def abfallarten():
+    # alle arten in prüfreihenfolge, SONSTIGE zuletzt
+    if _arten is None:
+        lade_abfallarten()
+    return _arten + [SONSTIGE]
+
+class Termin:
+    __slots__ = ('ordinal', 'code')
+    
+    def __init__(self, ordinal, code):
+        self.ordinal = ordinal
+        self.code = code
+    
+    @property
+    def date(self):
+        return date.fromordinal(self.ordinal)
+    
+    @property
+    def datum(self):
+        return self.date.strftime('%d.%m.%Y')
+    
+    @property
+    def typ(self):
+        return _typ_namen[self.code]
+    
+    @property
+    def art(self):
+        return _typ_arten[self.code]
+    
+    # erlaubt weiterhin "for datum, typ in termine"
+    def __iter__(self):
+        yield self.datum
+        yield self.typ
+    
+    def __eq__(self, other):
+        if isinstance(other, Termin):
+            return self.ordinal == other.ordinal and self.code == other.code
+        return tuple(self) == other
+    
+    def __hash__(self):
+        return hash((self.ordinal, self.code))
+    
+    def __repr__(self):
+        return f"Termin({self.datum!r}, {self.typ!r})"
+
+# termine als zwei parallele arrays (datum-ordinal, typ-code), sortiert nach
+# datum und typ. pro typ gibt es zusätzlich ein sortiertes ordinal-array für
+# schnelle "nächster termin"-abfragen.
+class TerminListe:
+    __slots__ = ('_tage', '_codes', '_pro_typ')
+    
+    def __init__(self, events=()):
+        rows = sorted((d.toordinal(), typ) for d, typ in events)
+        self._tage = array('i', (ordinal for ordinal, _ in rows))
+        self._codes = array('H', (typ_code(typ) for _, typ in rows))
+        self._pro_typ = {}
+        for ordinal, code in zip(self._tage, self._codes):
+            self._pro_typ.setdefault(code, array('i')).append(ordinal)
+    
+    @classmethod
+    def from_columns(cls, tage, codes):
+        # schon sortierte arrays übernehmen, ohne datumsobjekte zu erzeugen
+        liste = cls.__new__(cls)
+        liste._tage = tage
+        liste._codes = codes
+        liste._pro_typ = {}
+        for ordinal, code in zip(tage, codes):
+            liste._pro_typ.setdefault(code, array('i')).append(ordinal)
+        return liste
+    
+    @classmethod
+    def from_rows(cls, rows):
+        # (datum "dd.mm.yyyy", typ) wie in cache und history
+        return cls((datetime.strptime(datum, '%d.%m.%Y').date(), typ) for datum, typ in rows)
+    
+    def __len__(self):
+        return len(self._tage)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Termin(self._tage[index], self._codes[index])
+    
+    def __iter__(self):
+        for ordinal, code in zip(self._tage, self._codes):
+            yield Termin(ordinal, code)
+    
+    def __eq__(self, other):
+        if isinstance(other, TerminListe):
+            return self._tage == other._tage and self._codes == other._codes
+        return list(map(tuple, self)) == [tuple(t) for t in other]
+    
+    def __repr__(self):
+        return f"TerminListe({len(self)} Termine)"
+    
+    def spalten(self):
+        # (ordinals, typ-codes) als arrays, für auswertungen ohne Termin-objekte
+        return self._tage, self._codes
+    
+    def typen(self):
+        return [_typ_namen[code] for code in self._pro_typ]
+    
+    def tage(self, typ):
+        return self._pro_typ.get(_typ_codes.get(typ), array('i'))
+    
+    def anzahl_pro_typ(self):
+        return {_typ_namen[code]: len(tage) for code, tage in self._pro_typ.items()}
+    
+    def naechster(self, typ=None, ab=None):
+        # erster termin (vom typ) am oder nach dem datum, O(log n)
+        ordinal = (ab or date.today()).toordinal()
+        if typ is None:
+            i = bisect_left(self._tage, ordinal)
+            return self[i] if i < len(self._tage) else None
+        code = _typ_codes.get(typ)
+        tage = self._pro_typ.get(code)
+        if tage is None:
+            return None
+        i = bisect_left(tage, ordinal)
+        return Termin(tage[i], code) if i < len(tage) else None
+
+def diff_termine(alt, neu, fenster=SYNC_FENSTER):
+    # änderungen zwischen zwei terminlisten. ein termin gilt als derselbe, wenn
+    # abfallart und datum übereinstimmen; fällt ein termin weg und gibt es
+    # innerhalb von `fenster` tagen einen neuen derselben art, ist er verschoben
+    # (uids der stadt sind nicht über downloads hinweg stabil)
+    aenderungen = {'neu': [], 'entfallen': [], 'verschoben': []}
+    for typ in dict.fromkeys(alt.typen() + neu.typen()):
+        tage_alt = alt.tage(typ)
+        tage_neu = neu.tage(typ)
+        if tage_alt == tage_neu:
+            continue
+        weg = sorted(set(tage_alt) - set(tage_neu))
+        dazu = sorted(set(tage_neu) - set(tage_alt))
+        code = typ_code(typ)
+        i = j = 0
+        while i < len(weg) and j < len(dazu):
+            if abs(weg[i] - dazu[j]) <= fenster:
+                aenderungen['verschoben'].append((Termin(weg[i], code), Termin(dazu[j], code)))
+                i += 1
+                j += 1
+            elif weg[i] < dazu[j]:
+                aenderungen['entfallen'].append(Termin(weg[i], code))
+                i += 1
+            else:
+                aenderungen['neu'].append(Termin(dazu[j], code))
+                j += 1
+        aenderungen['entfallen'] += [Termin(t, code) for t in weg[i:]]
+        aenderungen['neu'] += [Termin(t, code) for t in dazu[j:]]
+    return aenderungen
+
+def beschreibe_aenderungen(aenderungen):
+    kurz = lambda t: t.date.strftime('%d.%m.')
+    zeilen = [f"{a.typ} von {kurz(a)} auf {kurz(n)} verschoben" for a, n in aenderungen['verschoben']]
+    zeilen += [f"{t.typ} am {kurz(t)} entfällt" for t in aenderungen['entfallen']]
+    zeilen += [f"{t.typ} am {kurz(t)} neu" for t in aenderungen['neu']]
+    return zeilen
+
+def sort_termine(events):
+    return TerminListe((e['datum'], e['typ']) for e in events)
+
+def parse_ical(text):
+    return sort_termine(iter_ical_events([text]))
+
+# zeitmessung pro phase (get, citychanged, forward, ical, parse, cache, treeview).
+# hooks bekommen je abgeschlossener phase ein dict mit phase, ts, dauer_ms und
+# weiteren feldern wie status, bytes oder cache. ohne hook kostet ein span nur
+# zwei perf_counter-aufrufe
+_hooks = []
+
+def add_hook(hook):
+    _hooks.append(hook)
+    return hook
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def melde_span(phase, dauer, **felder):
+    if not _hooks:
+        return
+    eintrag = dict(phase=phase, ts=round(time.time(), 3), dauer_ms=round(dauer * 1000, 3), **felder)
+    for hook in list(_hooks):
         try:
-            hnr_int = int(hnr)
-        except ValueError:
-            messagebox.showerror("Fehler", "Hausnummer muss eine Zahl sein")
+            hook(eintrag)
+        except Exception as e:
+            print(f"Zeitmessung: {hook!r} fehlgeschlagen: {e}", file=sys.stderr)
+
+@contextmanager
+def span(phase, **felder):
+    # with span("get") as felder: ... felder['status'] = r.status_code
+    start = time.perf_counter()
+    try:
+        yield felder
+    except BaseException as e:
+        felder['fehler'] = type(e).__name__
+        raise
+    finally:
+        melde_span(phase, time.perf_counter() - start, **felder)
+
+class TraceDatei:
+    # hook, der jeden span als json-zeile anhängt
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    def __call__(self, eintrag):
+        zeile = json.dumps(eintrag, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._f.write(zeile)
+            self._f.flush()
+    
+    def close(self):
+        self._f.close()
+
+class PhasenStatistik:
+    # hook mit den letzten `fenster` dauern pro phase und cache-treffern
+    def __init__(self, fenster=200):
+        self.fenster = fenster
+        self._lock = threading.Lock()
+        self._dauern = {}
+        self._anzahl = {}
+        self.cache = {}
+    
+    def __call__(self, eintrag):
+        phase = eintrag['phase']
+        with self._lock:
+            if phase not in self._dauern:
+                self._dauern[phase] = deque(maxlen=self.fenster)
+            self._dauern[phase].append(eintrag['dauer_ms'])
+            self._anzahl[phase] = self._anzahl.get(phase, 0) + 1
+            if 'cache' in eintrag:
+                self.cache[eintrag['cache']] = self.cache.get(eintrag['cache'], 0) + 1
+    
+    def zusammenfassung(self):
+        # [(phase, anzahl, p50, p95, letzte)] in ms
+        with self._lock:
+            return [(phase, self._anzahl[phase], _percentile(dauern, 50), _percentile(dauern, 95), dauern[-1])
+                    for phase, dauern in self._dauern.items()]
+
+def _gemessen(chunks, netz):
+    # wartezeit auf das netz und größe in netz[0]/netz[1] aufsummieren
+    it = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(it, None)
+        netz[0] += time.perf_counter() - start
+        if chunk is None:
             return
-        
-        entry = {'strasse': strasse, 'hnr': hnr, 'zusatz': zusatz}
-        if entry not in self.history:
-            self.history.append(entry)
-            self.save_history()
-            self.update_history_list()
-        
-        self.suchen_btn.config(state="disabled")
-        self.status.config(text="⏳ Lade Termine...")
-        
-        def fetch():
+        netz[1] += len(chunk)
+        yield chunk
+
+# schützt die stadt vor anfragen, solange ihr server offensichtlich nicht
+# antwortet: nach `schwelle` fehlern in folge ist er `pause` sekunden
+# gesperrt, danach entscheidet ein einzelner probeversuch
+class CircuitBreaker:
+    def __init__(self, schwelle=BREAKER_FEHLER, pause=BREAKER_PAUSE):
+        self.schwelle = schwelle
+        self.pause = pause
+        self._lock = threading.Lock()
+        self._fehler = 0
+        self._offen_bis = 0.0
+        self._probe = False
+    
+    @property
+    def offen(self):
+        return self._fehler >= self.schwelle
+    
+    def pruefen(self):
+        # True, wenn die anfrage der probeversuch ist: dann muss sie mit
+        # erfolg() oder fehler() enden, sonst bleibt der breaker gesperrt
+        with self._lock:
+            if self._fehler < self.schwelle:
+                return False
+            rest = self._offen_bis - time.monotonic()
+            if rest > 0:
+                raise CircuitOpen(f"Server nicht erreichbar, nächster Versuch in {rest:.0f} s")
+            if self._probe:
+                raise CircuitOpen("Server nicht erreichbar, Probeversuch läuft")
+            self._probe = True
+            return True
+    
+    def erfolg(self):
+        with self._lock:
+            self._fehler = 0
+            self._probe = False
+    
+    def fehler(self):
+        with self._lock:
+            self._fehler += 1
+            self._probe = False
+            if self._fehler >= self.schwelle:
+                self._offen_bis = time.monotonic() + self.pause
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def circuit_breaker(url):
+    # ein breaker pro host, geteilt von allen clients im prozess
+    host = urlparse(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+def voruebergehend(fehler):
+    # netzwerkfehler, timeouts und 5xx lohnen einen neuen versuch, 4xx nicht
+    if isinstance(fehler, requests.HTTPError):
+        return fehler.response is not None and fehler.response.status_code >= 500
+    return isinstance(fehler, (requests.ConnectionError, requests.Timeout))
+
+def _backoff(versuch, basis=BACKOFF):
+    # "full jitter", damit wartende clients nicht gleichzeitig wiederkommen
+    return random.uniform(0, basis * 2 ** versuch)
+
+# hält session (keep-alive) und die versteckten formularfelder über mehrere
+# abfragen, dadurch entfällt der initiale GET. nicht zwischen threads teilen,
+# der server merkt sich die gewählte adresse pro session.
+class TermineClient:
+    def __init__(self, url=API_URL, pool_size=4, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF):
+        self.url = url
+        self.session = requests.session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = circuit_breaker(url)
+        self.requests = 0
+        self._antwortzeit = None
+        self._form = None
+        self._lock = threading.Lock()
+    
+    def _timeout(self):
+        # lese-timeout: vierfache gleitende antwortzeit, begrenzt auf TIMEOUT_MIN..timeout
+        verbinden, lesen = self.timeout
+        if self._antwortzeit is None:
+            return self.timeout
+        return verbinden, min(lesen, max(TIMEOUT_MIN, 4 * self._antwortzeit))
+    
+    def _anfrage(self, methode, **kwargs):
+        probe = self.breaker.pruefen()
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            r = self.session.request(methode, self.url, timeout=self._timeout(), **kwargs)
+            if r.status_code >= 500:
+                r.raise_for_status()
+        except BaseException as e:
+            # ein gescheiterter probeversuch zählt immer als fehler
+            if probe or voruebergehend(e):
+                self.breaker.fehler()
+            raise
+        dauer = time.perf_counter() - start
+        self._antwortzeit = dauer if self._antwortzeit is None else 0.8 * self._antwortzeit + 0.2 * dauer
+        self.breaker.erfolg()
+        return r
+    
+    def _get(self, **kwargs):
+        with span("get") as felder:
+            r = self._anfrage("GET", **kwargs)
+            felder['status'] = r.status_code
+            felder['bytes'] = len(r.content)
+            r.raise_for_status()
+        r.encoding = "utf-8"
+        return r
+    
+    def _post(self, data, phase="post"):
+        with span(phase) as felder:
+            r = self._anfrage("POST", data=data)
+            felder['status'] = r.status_code
+            felder['bytes'] = len(r.content)
+            r.raise_for_status()
+        r.encoding = "utf-8"
+        return r
+    
+    def handshake(self):
+        r = self._get(params={"SubmitAction": "wasteDisposalServices", "InFrameMode": "TRUE"})
+        parser = HiddenInputParser()
+        parser.feed(r.text)
+        self._form = parser.args
+    
+    def post_form(self, **felder):
+        # formular mit geänderten feldern abschicken, z.b. um auswahllisten zu lesen
+        with self._lock:
+            if self._form is None:
+                self.handshake()
+            return self._post(dict(self._form, **felder), felder.get("SubmitAction", "post").lower()).text
+    
+    def _lookup(self, street, house_number, address_suffix, ort):
+        args = dict(self._form)
+        args["Ort"] = ort or street[0].upper()
+        args["Strasse"] = street
+        args["Hausnummer"] = str(house_number)
+        args["Hausnummerzusatz"] = address_suffix
+        args["SubmitAction"] = "CITYCHANGED"
+        self._post(args, "citychanged")
+        
+        args["SubmitAction"] = "forward"
+        for i in range(1, 10):
+            args[f"ContainerGewaehlt_{i}"] = "on"
+        self._post(args, "forward")
+        
+        args["ApplicationName"] = "com.athos.nl.mvc.abfterm.AbfuhrTerminModel"
+        args["SubmitAction"] = "filedownload_ICAL"
+        # download und parser laufen verschränkt: die wartezeit auf das netz
+        # zählt als "ical", der rest als "parse"
+        start = time.perf_counter()
+        r = self._anfrage("POST", data=args, stream=True)
+        netz = [time.perf_counter() - start, 0]
+        try:
+            r.raise_for_status()
+            r.encoding = "utf-8"
+            chunks = _gemessen(r.iter_content(chunk_size=8192, decode_unicode=True), netz)
+            termine = sort_termine(iter_ical_events(chunks))
+        except KeinKalender:
+            # abgelaufene session: server liefert wieder das formular statt ical
+            raise FormRejected("Server hat die Formulardaten nicht angenommen")
+        except requests.RequestException as e:
+            # abbruch oder timeout mitten im download, 4xx zählen nicht
+            if voruebergehend(e):
+                self.breaker.fehler()
+            raise
+        finally:
+            r.close()
+            melde_span("ical", netz[0], status=r.status_code, bytes=netz[1])
+        melde_span("parse", time.perf_counter() - start - netz[0], termine=len(termine))
+        return termine
+    
+    def get_termine(self, street, house_number, address_suffix="", ort=None):
+        # vorübergehende fehler mit exponentiellem backoff wiederholen
+        for versuch in range(self.retries + 1):
             try:
-                termine = get_termine(strasse, hnr_int, zusatz)
-                self.root.after(0, lambda: self.zeige_termine(termine))
-            except Exception as e:
-                self.root.after(0, lambda: self.zeige_fehler(str(e)))
-        
-        threading.Thread(target=fetch, daemon=True).start()
+                return self._get_termine(street, house_number, address_suffix, ort)
+            except requests.RequestException as e:
+                if versuch == self.retries or not voruebergehend(e):
+                    raise
+            time.sleep(_backoff(versuch, self.backoff))
     
-    def zeige_termine(self, termine):
-        self.current_termine = termine
-        
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        letztes_datum = None
-        for datum, typ in termine:
-            if letztes_datum and letztes_datum != datum:
-                self.tree.insert("", tk.END, values=("", ""), tags=('separator',))
-            
-            tag = ''
-            if 'Restmüll' in typ or 'Restmuell' in typ:
-                tag = 'restmuell'
-            elif 'Bio' in typ:
-                tag = 'biomuell'
-            elif 'Papier' in typ:
-                tag = 'papier'
-            elif 'Gelb' in typ:
-                tag = 'gelb'
-            
-            self.tree.insert("", tk.END, values=(datum, typ), tags=(tag,))
-            letztes_datum = datum
-        
-        self.status.config(text=f"✅ {len(termine)} Termine gefunden")
-        self.suchen_btn.config(state="normal")
+    def _get_termine(self, street, house_number, address_suffix, ort):
+        with self._lock:
+            if self._form is None:
+                self.handshake()
+                return self._lookup(street, house_number, address_suffix, ort)
+            try:
+                return self._lookup(street, house_number, address_suffix, ort)
+            except (FormRejected, requests.HTTPError) as e:
+                # abgelaufene session: neu anmelden. 5xx übernimmt die
+                # wiederholung mit backoff in get_termine
+                if voruebergehend(e):
+                    raise
+                self.handshake()
+                return self._lookup(street, house_number, address_suffix, ort)
     
-    def zeige_fehler(self, fehler):
-        messagebox.showerror("Fehler", f"Fehler beim Abrufen:\n{fehler}")
-        self.status.config(text="❌ Fehler")
-        self.suchen_btn.config(state="normal")
+    def close(self):
+        self.session.close()
+
+def get_termine(street, house_number, address_suffix="", url=API_URL, ort=None):
+    client = TermineClient(url)
+    try:
+        return client.get_termine(street, house_number, address_suffix, ort)
+    finally:
+        client.close()
+
+# fragt einen laufenden "bamberg_muell.py serve" statt der stadt ab,
+# gleiche schnittstelle wie TermineClient
+class ServiceClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.session()
     
-    def toggle_dark_mode(self):
-        self.dark_mode = not self.dark_mode
-        self.build_ui()
+    def abrufen(self, street, house_number, address_suffix=""):
+        # (termine, stand, veraltet) mit dem stand des dienst-caches
+        with span("dienst") as felder:
+            r = self.session.get(f"{self.base_url}/termine", timeout=TIMEOUT,
+                                 params={'strasse': street, 'hnr': house_number, 'zusatz': address_suffix})
+            felder['status'] = r.status_code
+            felder['bytes'] = len(r.content)
+        if r.status_code >= 400:
+            try:
+                fehler = r.json()['fehler']
+            except (ValueError, KeyError, TypeError):
+                # keine fehlermeldung des dienstes (z.b. von einem proxy)
+                r.raise_for_status()
+            raise requests.HTTPError(fehler, response=r)
+        daten = r.json()
+        termine = TerminListe((date.fromisoformat(t['datum']), t['typ']) for t in daten['termine'])
+        return termine, datetime.fromisoformat(daten['stand']).timestamp(), daten.get('veraltet', False)
     
-    def drucken(self):
-        if not self.current_termine:
-            messagebox.showinfo("Drucken", "Keine Termine zum Drucken vorhanden")
-            return
-        
-        # druckvorschau fenster
-        print_window = tk.Toplevel(self.root)
-        print_window.title("Druckvorschau")
-        print_window.geometry("600x700")
-        
-        text = scrolledtext.ScrolledText(print_window, font=('Courier', 10), wrap=tk.WORD)
-        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        # format für druck
-        text.insert(tk.END, "=" * 60 + "\n")
-        text.insert(tk.END, "        BAMBERG ABFUHRTERMINE\n")
-        text.insert(tk.END, "=" * 60 + "\n\n")
-        
-        adresse = f"{self.strasse_entry.get()} {self.hnr_entry.get()}{self.zusatz_entry.get()}"
-        text.insert(tk.END, f"Adresse: {adresse}\n")
-        text.insert(tk.END, f"Erstellt: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n")
-        text.insert(tk.END, "-" * 60 + "\n\n")
-        
-        letztes_datum = None
-        for datum, typ in self.current_termine:
-            if letztes_datum and letztes_datum != datum:
-                text.insert(tk.END, "\n")
-            text.insert(tk.END, f"{datum:12} | {typ}\n")
-            letztes_datum = datum
-        
-        text.insert(tk.END, "\n" + "=" * 60 + "\n")
-        text.insert(tk.END, "\nEntwickelt von Oliver Schlegel\n")
-        
-        text.config(state=tk.DISABLED)
-        
-        btn_frame = tk.Frame(print_window)
-        btn_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        def save_txt():
-            filename = f"abfuhrtermine_{datetime.now().strftime('%Y%m%d')}.txt"
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(text.get(1.0, tk.END))
-            messagebox.showinfo("Gespeichert", f"Datei gespeichert als {filename}")
-        
-        tk.Button(btn_frame, text="Als TXT speichern", command=save_txt).pack(side=tk.LEFT, padx=5)
-        tk.Button(btn_frame, text="Schließen", command=print_window.destroy).pack(side=tk.LEFT)
+    def get_termine(self, street, house_number, address_suffix="", ort=None):
+        # veraltete daten kommen als VeralteteTermine, nie als frischer stand
+        termine, stand, veraltet = self.abrufen(street, house_number, address_suffix)
+        if veraltet:
+            raise VeralteteTermine(termine, stand)
+        return termine
     
-    def zeige_statistik(self):
-        if not self.current_termine:
-            messagebox.showinfo("Statistik", "Keine Termine für Statistik vorhanden")
-            return
-        
-        # statistik fenster
-        stats_window = tk.Toplevel(self.root)
-        stats_window.title("Statistik")
-        stats_window.geometry("500x400")
-        
-        c = self.get_colors()
-        stats_window.configure(bg=c['bg'])
-        
-        # header
-        header = tk.Label(stats_window, text="📊 Abfallstatistik", 
-                         font=('Segoe UI', 16, 'bold'),
-                         bg=c['bg'], fg=c['text'])
-        header.pack(pady=20)
-        
-        # zähle abfallarten
-        typen = [typ for _, typ in self.current_termine]
-        counter = Counter(typen)
-        
-        # frame für statistik
-        stats_frame = tk.Frame(stats_window, bg=c['card'], relief='solid', bd=1)
-        stats_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
-        
-        tk.Label(stats_frame, text="Anzahl Termine pro Abfallart:", 
-                font=('Segoe UI', 11, 'bold'),
-                bg=c['card'], fg=c['text']).pack(pady=15)
-        
-        for typ, anzahl in counter.most_common():
-            item_frame = tk.Frame(stats_frame, bg=c['card'])
-            item_frame.pack(fill=tk.X, padx=20, pady=5)
-            
-            tk.Label(item_frame, text=typ, font=('Segoe UI', 10),
-                    bg=c['card'], fg=c['text'], anchor='w').pack(side=tk.LEFT, fill=tk.X, expand=True)
-            
-            tk.Label(item_frame, text=f"{anzahl}x", font=('Segoe UI', 10, 'bold'),
-                    bg=c['card'], fg=c['primary']).pack(side=tk.RIGHT)
-        
-        # gesamt
-        total_frame = tk.Frame(stats_frame, bg=c['header'], height=50)
-        total_frame.pack(fill=tk.X, side=tk.BOTTOM, pady=15, padx=20)
-        
-        tk.Label(total_frame, text="Gesamt:", font=('Segoe UI', 11, 'bold'),
-                bg=c['header'], fg=c['text']).pack(side=tk.LEFT, padx=10)
-        
-        tk.Label(total_frame, text=f"{len(self.current_termine)} Termine", 
-                font=('Segoe UI', 11, 'bold'),
-                bg=c['header'], fg=c['primary']).pack(side=tk.RIGHT, padx=10)
+    def close(self):
+        self.session.close()
 
-if __name__ == "__main__":
-    root = tk.Tk()
-    root.withdraw()
+def ical_falten(zeile):
+    # rfc 5545: höchstens 75 oktette pro zeile, fortsetzung mit CRLF und
+    # leerzeichen, nie mitten in einem utf-8 zeichen
+    if len(zeile.encode('utf-8')) <= 75:
+        return zeile
+    teile, stueck, groesse, platz = [], "", 0, 75
+    for z in zeile:
+        n = len(z.encode('utf-8'))
+        if groesse + n > platz:
+            teile.append(stueck)
+            stueck, groesse, platz = "", 0, 74
+        stueck += z
+        groesse += n
+    teile.append(stueck)
+    return "\r\n ".join(teile)
+
+def ical_events(termine, name="Abfuhrtermine", alarm=None, ort=None):
+    # VEVENTs einer adresse, zeilen schon gefaltet. alarm: erinnerung so
+    # viele stunden vor tagesbeginn
+    return map(ical_falten, _vevents(termine, name, alarm, ort))
+
+def _vevents(termine, name, alarm, ort):
+    uids = {}
+    for t in termine:
+        tag = t.date.strftime('%Y%m%d')
+        uid = uids.get(t.code)
+        if uid is None:
+            uid = uids[t.code] = re.sub(r'[^a-z0-9]+', '-', f"{name} {t.typ}".lower()).strip('-')
+        summary = t.typ.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        yield "BEGIN:VEVENT"
+        yield f"UID:{tag}-{uid}@bamberg-muellkalender"
+        yield f"DTSTART;VALUE=DATE:{tag}"
+        yield f"DTEND;VALUE=DATE:{(t.date + timedelta(days=1)).strftime('%Y%m%d')}"
+        yield "SUMMARY:" + summary
+        yield "CATEGORIES:" + t.art.name
+        if ort:
+            yield "LOCATION:" + ort.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        if alarm is not None:
+            yield "BEGIN:VALARM"
+            yield "ACTION:DISPLAY"
+            yield "DESCRIPTION:" + summary
+            yield f"TRIGGER:-PT{alarm}H"
+            yield "END:VALARM"
+        yield "END:VEVENT"
+
+def ical_lines(termine, name="Abfuhrtermine", alarm=None):
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield "PRODID:-//bamberg-muellkalender//DE"
+    yield ical_falten(f"X-WR-CALNAME:{name}")
+    yield from ical_events(termine, name, alarm)
+    yield "END:VCALENDAR"
+
+def _fetch_with_retry(address, url, host_limit, retries, backoff):
+    # address: (strasse, hnr, zusatz) oder mit ort aus dem straßenverzeichnis
+    strasse, hnr, zusatz, *ort = address
+    ort = ort[0] if ort else None
+    result = {'strasse': strasse, 'hnr': hnr, 'zusatz': zusatz,
+              'termine': None, 'fehler': None, 'versuche': 0}
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        result['versuche'] = attempt + 1
+        try:
+            with host_limit:
+                result['termine'] = _thread_client(url).get_termine(strasse, int(hnr), zusatz, ort)
+            result['fehler'] = None
+            break
+        except Exception as e:
+            result['fehler'] = str(e)
+            # ungültige hausnummer, 4xx, abgelehntes formular oder gesperrter
+            # server: wiederholen bringt nichts bzw. belastet ihn nur
+            if not voruebergehend(e):
+                break
+            if attempt < retries:
+                time.sleep(_backoff(attempt, backoff))
+    result['dauer'] = time.perf_counter() - start
+    return result
+
+_clients = threading.local()
+
+def _thread_client(url):
+    # ein client pro worker-thread, damit verbindungen und formular wiederverwendet werden
+    clients = _clients.__dict__.setdefault('by_url', {})
+    if url not in clients:
+        # wiederholungen übernimmt _fetch_with_retry
+        clients[url] = TermineClient(url, retries=0)
+    return clients[url]
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+def _host_limit(url, per_host):
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if (host, per_host) not in _host_limits:
+            _host_limits[(host, per_host)] = threading.BoundedSemaphore(per_host)
+        return _host_limits[(host, per_host)]
+
+def get_termine_bulk(addresses, workers=8, per_host=4, retries=2, backoff=0.5, url=API_URL):
+    # liefert ergebnis-dicts in der reihenfolge, in der sie fertig werden
+    host_limit = _host_limit(url, per_host)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fetch_with_retry, address, url, host_limit, retries, backoff)
+                   for address in addresses]
+        for future in as_completed(futures):
+            yield future.result()
+
+def read_addresses(f):
+    sample = f.read(2048)
+    f.seek(0)
+    try:
+        reader = csv.reader(f, csv.Sniffer().sniff(sample, delimiters=";,\t"))
+    except csv.Error:
+        reader = csv.reader(f, delimiter=';')
+    addresses = []
+    for row in reader:
+        row = [col.strip() for col in row]
+        if not row or not row[0] or row[0].lower() in ('strasse', 'straße'):
+            continue
+        strasse, hnr = row[0], row[1] if len(row) > 1 else ""
+        zusatz = row[2] if len(row) > 2 else ""
+        addresses.append((strasse, hnr, zusatz))
+    return addresses
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def run_bulk(args):
+    with open(args.bulk, newline='', encoding='utf-8') as f:
+        addresses = read_addresses(f)
+    
+    out = open(args.out, 'w', newline='', encoding='utf-8') if args.out else sys.stdout
+    writer = csv.writer(out, delimiter=';')
+    writer.writerow(["strasse", "hnr", "zusatz", "datum", "typ"])
+    
+    dauern = []
+    fehler = 0
+    start = time.perf_counter()
+    try:
+        for result in get_termine_bulk(addresses, args.workers, args.per_host,
+                                       args.retries, url=args.url):
+            dauern.append(result['dauer'])
+            if result['fehler']:
+                fehler += 1
+                print(f"Fehler bei {result['strasse']} {result['hnr']}{result['zusatz']}: "
+                      f"{result['fehler']} ({result['versuche']} Versuche)", file=sys.stderr)
+                continue
+            for datum, typ in result['termine']:
+                writer.writerow([result['strasse'], result['hnr'], result['zusatz'], datum, typ])
+            out.flush()
+    finally:
+        if args.out:
+            out.close()
+    gesamt = time.perf_counter() - start
+    
+    print(f"{len(addresses)} Adressen in {gesamt:.2f}s ({len(addresses) / gesamt if gesamt else 0:.1f}/s), "
+          f"{fehler} Fehler", file=sys.stderr)
+    print(f"Latenz: p50 {_percentile(dauern, 50):.3f}s, p95 {_percentile(dauern, 95):.3f}s, "
+          f"max {max(dauern, default=0):.3f}s", file=sys.stderr)
+    return 1 if fehler else 0
+
+_HEADER = struct.Struct('<4sHHII')   # magic, version, frei, log-anfang, index-offset
+_RECORD = struct.Struct('<cI')        # art, länge der nutzdaten
+_INDEX_ADRESSE = struct.Struct('<ddII')  # fetched, accessed, anzahl, daten-offset
+_LOG_ADRESSE = struct.Struct('<ddI')     # fetched, accessed, anzahl (daten folgen direkt)
+_DEFEKT = (struct.error, UnicodeDecodeError, ValueError, IndexError)  # beim lesen einer kaputten datei
+
+# binäres abbild von terminen und history, wird per mmap gelesen:
+#
+#   kopf | datenblöcke | index | log
+#
+# ein datenblock sind anzahl int32-ordinals gefolgt von anzahl uint16-typ-codes.
+# der index enthält typ-tabelle, adress-offset-tabelle und history, es wird also
+# nur der index geparst, termine erst beim zugriff. änderungen werden als
+# log-einträge angehängt (A=adresse mit eigener typ-tabelle, D=gelöscht,
+# H=history); ab SNAPSHOT_COMPACT einträgen wird die datei neu geschrieben und
+# per os.replace getauscht. alle zahlen little-endian.
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        self._open()
     
-    splash = SplashScreen(root)
+    def _reset(self):
+        self._global = []      # typ-code im index -> typ_code()
+        self._adressen = {}    # key -> (fetched, accessed, anzahl, daten-offset, typ-codes)
+        self.history = []
+        self._log = 0
     
-    def show_main():
-        root.deiconify()
-        app = AbfallApp(root)
+    def _open(self):
+        self._reset()
+        self._mm = None
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_size < _HEADER.size or not self._map(st):
+            self._write_base({}, [])
+    
+    def _map(self, st):
+        # False, wenn die datei nicht passt oder beschädigt ist; sie wird dann neu angelegt
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, log_start, index_off = _HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            mm.close()
+            return False
+        self._mm = mm
+        self._ino = st.st_ino
+        try:
+            if not _HEADER.size <= index_off <= log_start <= len(mm):
+                raise ValueError("ungültige offsets im kopf")
+            self._read_index(index_off)
+            self._size = log_start
+            self._read_log()
+        except _DEFEKT as e:
+            print(f"{self.path} ist beschädigt ({e}), Cache wird neu angelegt", file=sys.stderr)
+            mm.close()
+            self._mm = None
+            self._reset()
+            return False
+        return True
+    
+    def _read_index(self, pos):
+        mm = self._mm
+        ende = pos  # datenblöcke liegen vor dem index
+        (n_typen,) = struct.unpack_from('<I', mm, pos)
+        pos += 4
+        pos = self._read_typen(n_typen, pos, self._global)
+        (n_adressen,) = struct.unpack_from('<I', mm, pos)
+        pos += 4
+        for _ in range(n_adressen):
+            (n,) = struct.unpack_from('<H', mm, pos)
+            key = mm[pos + 2:pos + 2 + n].decode('utf-8')
+            pos += 2 + n
+            eintrag = _INDEX_ADRESSE.unpack_from(mm, pos)
+            if eintrag[3] + 6 * eintrag[2] > ende:
+                raise ValueError(f"termine von {key} außerhalb der datenblöcke")
+            self._adressen[key] = eintrag + (self._global,)
+            pos += _INDEX_ADRESSE.size
+        (n,) = struct.unpack_from('<I', mm, pos)
+        self.history = json.loads(mm[pos + 4:pos + 4 + n].decode('utf-8'))
+    
+    def _read_typen(self, anzahl, pos, typen):
+        mm = self._mm
+        for _ in range(anzahl):
+            (n,) = struct.unpack_from('<H', mm, pos)
+            typen.append(typ_code(mm[pos + 2:pos + 2 + n].decode('utf-8')))
+            pos += 2 + n
+        return pos
+    
+    def _read_log(self):
+        # nur die kurzen satzköpfe lesen, termine bleiben in der datei
+        mm = self._mm
+        pos = self._size
+        while pos + _RECORD.size <= len(mm):
+            art, n = _RECORD.unpack_from(mm, pos)
+            start = pos + _RECORD.size
+            if start + n > len(mm):
+                break  # halb geschriebener eintrag eines anderen prozesses
+            if art in (b'A', b'D'):
+                (k,) = struct.unpack_from('<H', mm, start)
+                key = mm[start + 2:start + 2 + k].decode('utf-8')
+                if art == b'D':
+                    self._adressen.pop(key, None)
+                else:
+                    daten = start + 2 + k
+                    fetched, accessed, anzahl = _LOG_ADRESSE.unpack_from(mm, daten)
+                    daten += _LOG_ADRESSE.size
+                    typen = []
+                    daten = self._read_typen(mm[daten], daten + 1, typen)
+                    if daten + 6 * anzahl > start + n:
+                        raise ValueError(f"log-eintrag von {key} zu kurz")
+                    self._adressen[key] = (fetched, accessed, anzahl, daten, typen)
+            elif art == b'H':
+                self.history = json.loads(mm[start:start + n].decode('utf-8'))
+            self._log += 1
+            pos = start + n
+        self._size = pos
+    
+    def refresh(self):
+        # änderungen anderer prozesse übernehmen (angehängt oder ausgetauscht)
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self._open()
+        if st.st_ino != self._ino:
+            self._mm.close()
+            return self._open()
+        if st.st_size > len(self._mm):
+            self._mm.close()
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self._read_log()
+            except _DEFEKT:
+                self._mm.close()
+                self._open()
+    
+    def keys(self):
+        return list(self._adressen)
+    
+    def info(self, key):
+        return self._adressen.get(key)
+    
+    def termine(self, key):
+        fetched, accessed, anzahl, off, typen = self._adressen[key]
+        tage = array('i')
+        tage.frombytes(self._mm[off:off + 4 * anzahl])
+        codes = array('H')
+        codes.frombytes(self._mm[off + 4 * anzahl:off + 6 * anzahl])
+        if sys.byteorder == 'big':
+            tage.byteswap()
+            codes.byteswap()
+        if codes and max(codes) >= len(typen):
+            return None  # beschädigter datenblock, eintrag gilt als fehlend
+        return TerminListe.from_columns(tage, array('H', (typen[c] for c in codes)))
+    
+    @staticmethod
+    def _pack_typen(typen):
+        data = b""
+        for typ in typen:
+            name = typ.encode('utf-8')
+            data += struct.pack('<H', len(name)) + name
+        return data
+    
+    @staticmethod
+    def _pack_termine(termine, codes):
+        tage = array('i', (t.ordinal for t in termine))
+        codes = array('H', (codes[t.typ] for t in termine))
+        if sys.byteorder == 'big':
+            tage.byteswap()
+            codes.byteswap()
+        return tage.tobytes() + codes.tobytes()
+    
+    def _append(self, records):
+        # ein write() mit O_APPEND, damit einträge nicht verzahnt werden
+        data = b"".join(_RECORD.pack(art, len(payload)) + payload for art, payload in records)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self.refresh()
+        if self._log > SNAPSHOT_COMPACT:
+            self.compact()
+    
+    def put(self, key, termine, fetched, accessed):
+        self.refresh()
+        typen = sorted({t.typ for t in termine})
+        k = key.encode('utf-8')
+        self._append([(b'A', struct.pack('<H', len(k)) + k
+                       + _LOG_ADRESSE.pack(fetched, accessed, len(termine))
+                       + bytes([len(typen)]) + self._pack_typen(typen)
+                       + self._pack_termine(termine, {typ: i for i, typ in enumerate(typen)}))])
+    
+    def delete(self, keys):
+        self.refresh()
+        records = []
+        for key in keys:
+            k = key.encode('utf-8')
+            records.append((b'D', struct.pack('<H', len(k)) + k))
+        if records:
+            self._append(records)
+    
+    def set_history(self, history):
+        self.refresh()
+        self._append([(b'H', json.dumps(history, ensure_ascii=False).encode('utf-8'))])
+    
+    def compact(self, keys=None):
+        keys = self.keys() if keys is None else keys
+        adressen = {key: self.termine(key) for key in keys}
+        adressen = {key: termine for key, termine in adressen.items() if termine is not None}
+        self._write_base(adressen, self.history, {key: self._adressen[key][:2] for key in adressen})
+    
+    def _write_base(self, adressen, history, zeiten=None):
+        # komplette datei neu schreiben und atomar austauschen
+        typen = sorted({t.typ for termine in adressen.values() for t in termine})
+        codes = {typ: i for i, typ in enumerate(typen)}
+        daten = bytearray(_HEADER.size)
+        offsets = {}
+        for key, termine in adressen.items():
+            offsets[key] = len(daten)
+            daten += self._pack_termine(termine, codes)
+        index_off = len(daten)
+        daten += struct.pack('<I', len(typen)) + self._pack_typen(typen)
+        daten += struct.pack('<I', len(adressen))
+        for key, termine in adressen.items():
+            k = key.encode('utf-8')
+            fetched, accessed = (zeiten or {}).get(key, (0.0, 0.0))
+            daten += struct.pack('<H', len(k)) + k + _INDEX_ADRESSE.pack(fetched, accessed, len(termine), offsets[key])
+        h = json.dumps(history, ensure_ascii=False).encode('utf-8')
+        daten += struct.pack('<I', len(h)) + h
+        _HEADER.pack_into(daten, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(daten), index_off)
+        
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(daten)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        try:
+            os.replace(tmp, self.path)
+        except OSError:
+            # unter windows kann ein anderer prozess die datei gemappt haben,
+            # dann bleibt es vorerst beim angehängten log
+            os.remove(tmp)
+        self._reset()
+        if not self._map(os.stat(self.path)):
+            raise OSError(f"Snapshot {self.path} konnte nicht gelesen werden")
+    
+    def clear(self):
+        # alle termine verwerfen, history bleibt
+        self.refresh()
+        self._write_base({}, self.history)
+    
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+# termine pro adresse auf der platte, mit ttl und lru-begrenzung
+class TermineCache:
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_entries=CACHE_MAX):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._snapshot = Snapshot(path)
+        # lru-reihenfolge im speicher, zugriffe werden erst beim nächsten put geschrieben
+        self._accessed = {key: self._snapshot.info(key)[1] for key in self._snapshot.keys()}
+    
+    @staticmethod
+    def key(street, house_number, address_suffix=""):
+        return f"{street.strip().lower()}|{str(house_number).strip()}|{address_suffix.strip().lower()}"
+    
+    def get(self, key):
+        with self._lock:
+            self._snapshot.refresh()
+            info = self._snapshot.info(key)
+            termine = self._snapshot.termine(key) if info is not None else None
+            if termine is None:
+                return None
+            self._accessed[key] = time.time()
+            return {'termine': termine, 'fetched': info[0], 'accessed': self._accessed[key]}
+    
+    def is_stale(self, entry):
+        return time.time() - entry['fetched'] > self.ttl
+    
+    def put(self, key, termine, fetched=None):
+        with self._lock:
+            now = time.time()
+            self._accessed[key] = now
+            self._snapshot.put(key, termine, fetched or now, now)
+            keys = self._snapshot.keys()
+            if len(keys) > self.max_entries:
+                lru = sorted(keys, key=lambda k: self._accessed.get(k, self._snapshot.info(k)[1]))
+                self._snapshot.delete(lru[:len(keys) - self.max_entries])
+    
+    def entries(self):
+        with self._lock:
+            self._snapshot.refresh()
+            keys = sorted(self._snapshot.keys(), key=lambda k: self._accessed.get(k, self._snapshot.info(k)[1]))
+            return [(key, self._snapshot.info(key)[0], self._snapshot.info(key)[2]) for key in keys]
+    
+    def alle(self):
+        # (key, termine) aller einträge, ohne die lru-reihenfolge zu ändern
+        with self._lock:
+            self._snapshot.refresh()
+            alle = ((key, self._snapshot.termine(key)) for key in self._snapshot.keys())
+            return [(key, termine) for key, termine in alle if termine is not None]
+    
+    def history(self):
+        with self._lock:
+            self._snapshot.refresh()
+            return list(self._snapshot.history)
     
-    root.after(3000, show_main)
-    root.mainloop()
+    def set_history(self, history):
+        with self._lock:
+            self._snapshot.set_history(history)
+    
+    def clear(self):
+        with self._lock:
+            self._snapshot.clear()
+            self._accessed = {}
+
+def offenes_index():
+    # straßenverzeichnis nur verwenden, wenn "index" schon gelaufen ist
+    from bamberg_muell_index import INDEX_FILE, StrassenIndex
+    if not os.path.exists(INDEX_FILE):
+        return None
+    index = StrassenIndex(INDEX_FILE)
+    if index.leer():
+        index.close()
+        return None
+    return index
+
+def lade_termine(strasse, hnr, zusatz="", cache=None, url=API_URL, offline=False, index=None):
+    # liefert (termine, stand, quelle). quelle ist None bei frisch geladenen
+    # terminen, "cache"/"index" ohne netzwerk und "veraltet", wenn die stadt
+    # nicht antwortet und der letzte stand aus dem cache einspringt
+    cache = cache or TermineCache()
+    key = TermineCache.key(strasse, hnr, zusatz)
+    with span("cache") as felder:
+        cached = cache.get(key)
+        felder['cache'] = "verfehlt" if cached is None else "veraltet" if cache.is_stale(cached) else "treffer"
+    if cached and (offline or not cache.is_stale(cached)):
+        return cached['termine'], cached['fetched'], "cache"
+    if index is not None:
+        # vorberechnete termine nur, solange sie nicht älter als der cache-ttl
+        # (offline egal) und neuer als der cache-eintrag sind
+        stand = index.stand("termine")
+        if ((offline or time.time() - stand <= cache.ttl)
+                and (cached is None or stand > cached['fetched'])):
+            termine = index.termine(strasse, hnr, zusatz)
+            if termine is not None:
+                return termine, stand, "index"
+        if not index.kennt(strasse, hnr, zusatz):
+            vorschlaege = ", ".join(index.vorschlaege(strasse[:4], 5))
+            raise LookupError(f"Adresse {strasse} {hnr}{zusatz} ist nicht im Straßenverzeichnis"
+                              + (f" (meinten Sie: {vorschlaege}?)" if vorschlaege else ""))
+    if offline:
+        raise LookupError(f"Keine Termine für {strasse} {hnr}{zusatz} im Cache")
+    ort = index.ort(strasse) if index is not None else None
+    try:
+        termine = get_termine(strasse, int(hnr), zusatz, url=url, ort=ort)
+    except (requests.RequestException, FormRejected):
+        # auch eine wartungs-/fehlerseite mit status 200 ist ein ausfall der stadt
+        if cached:
+            return cached['termine'], cached['fetched'], "veraltet"
+        raise
+    cache.put(key, termine)
+    return termine, time.time(), None
+
+WOCHENTAGE = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+
+def _datum_arg(text):
+    try:
+        return datetime.strptime(text, '%d.%m.%Y').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Datum im Format TT.MM.JJJJ erwartet: {text}")
+
+def _cli_termine(args):
+    cache = TermineCache(args.cache) if args.cache else TermineCache()
+    termine, stand, quelle = lade_termine(args.strasse, args.hnr, args.zusatz, cache,
+                                          args.url, args.offline, offenes_index())
+    stand = datetime.fromtimestamp(stand).strftime('%d.%m.%Y %H:%M')
+    if quelle == "veraltet":
+        print(f"(Server nicht erreichbar, veraltet seit {stand})", file=sys.stderr)
+    elif quelle:
+        print(f"(Cache, Stand {stand})", file=sys.stderr)
+    return termine
+
+def _typ_passt(typ, filter):
+    # teil des textes oder id der abfallart (--typ gelb, --typ restmuell)
+    return not filter or filter.lower() in typ.lower() or filter.lower() == abfallart(typ).id
+
+def cmd_next(args):
+    termine = _cli_termine(args)
+    ab = args.ab or date.today()
+    naechste = [termine.naechster(typ, ab) for typ in termine.typen() if _typ_passt(typ, args.typ)]
+    naechste = sorted((t for t in naechste if t), key=lambda t: (t.ordinal, t.typ))
+    if not naechste:
+        print("Keine weiteren Termine", file=sys.stderr)
+        return 1
+    for t in naechste:
+        print(f"{WOCHENTAGE[t.date.weekday()]} {t.datum}  {t.typ}")
+    return 0
+
+def cmd_list(args):
+    termine = _cli_termine(args)
+    ab = (args.ab or date.min).toordinal()
+    for t in termine:
+        if t.ordinal >= ab and _typ_passt(t.typ, args.typ):
+            print(f"{WOCHENTAGE[t.date.weekday()]} {t.datum}  {t.typ}")
+    return 0
+
+def _export_quellen(args):
+    # (adresse, termine) je adresse. cache-treffer sofort, der rest parallel
+    # und in der reihenfolge, in der die abrufe fertig werden
+    cache = TermineCache(args.cache) if args.cache else TermineCache()
+    if args.adressen == "-":
+        adressen = read_addresses(sys.stdin)
+    elif args.adressen:
+        with open(args.adressen, newline='', encoding='utf-8') as f:
+            adressen = read_addresses(f)
+    else:
+        adressen = [(a['strasse'], a['hnr'], a['zusatz']) for a in cache.history()]
+    fehlend = []
+    for strasse, hnr, zusatz in adressen:
+        cached = cache.get(TermineCache.key(strasse, hnr, zusatz))
+        if cached and (args.offline or not cache.is_stale(cached)):
+            yield f"{strasse} {hnr}{zusatz}", cached['termine']
+        elif args.offline:
+            print(f"Keine Termine für {strasse} {hnr}{zusatz} im Cache", file=sys.stderr)
+        else:
+            fehlend.append((strasse, hnr, zusatz))
+    for result in get_termine_bulk(fehlend, url=args.url):
+        adresse = f"{result['strasse']} {result['hnr']}{result['zusatz']}"
+        if result['fehler']:
+            print(f"Fehler bei {adresse}: {result['fehler']}", file=sys.stderr)
+            continue
+        cache.put(TermineCache.key(result['strasse'], result['hnr'], result['zusatz']), result['termine'])
+        yield adresse, result['termine']
+
+def cmd_export(args):
+    from bamberg_muell_export import exportiere, oeffne
+    mehrere = not args.strasse
+    if mehrere:
+        quellen = _export_quellen(args)
+        titel = "Abfuhrtermine"
+    elif not args.hnr:
+        raise ValueError("Hausnummer fehlt")
+    else:
+        adresse = f"{args.strasse} {args.hnr}{args.zusatz}"
+        quellen = [(adresse, _cli_termine(args))]
+        titel = f"Abfuhrtermine {adresse}"
+    if args.typ:
+        quellen = ((adresse, TerminListe((t.date, t.typ) for t in termine if _typ_passt(t.typ, args.typ)))
+                   for adresse, termine in quellen)
+    out = oeffne(args.out, args.format)
+    try:
+        exportiere(quellen, args.format, out, mehrere, args.alarm, titel)
+    finally:
+        if args.out:
+            out.close()
+        else:
+            out.flush()
+    return 0
+
+def cmd_sync(args):
+    # adressen der letzten anfragen neu laden und nur die änderungen melden
+    cache = TermineCache(args.cache) if args.cache else TermineCache()
+    if args.strasse:
+        adressen = [{'strasse': args.strasse, 'hnr': args.hnr or "", 'zusatz': args.zusatz}]
+    else:
+        adressen = cache.history()
+    if not adressen:
+        print("Keine Adressen in den letzten Anfragen", file=sys.stderr)
+        return 1
+    fehler = 0
+    # gleiche ort-auflösung wie lade_termine, sonst fragt sync eine andere liste ab
+    index = offenes_index()
+    for a in adressen:
+        name = f"{a['strasse']} {a['hnr']}{a['zusatz']}"
+        key = TermineCache.key(a['strasse'], a['hnr'], a['zusatz'])
+        cached = cache.get(key)
+        ort = index.ort(a['strasse']) if index is not None else None
+        try:
+            termine = get_termine(a['strasse'], int(a['hnr']), a['zusatz'], url=args.url, ort=ort)
+        except (ValueError, requests.RequestException, FormRejected) as e:
+            print(f"{name}: Fehler: {e}", file=sys.stderr)
+            fehler += 1
+            continue
+        cache.put(key, termine)
+        if cached is None:
+            print(f"{name}: {len(termine)} Termine neu geladen")
+            continue
+        aenderungen = beschreibe_aenderungen(diff_termine(cached['termine'], termine))
+        print(f"{name}: " + (f"{len(aenderungen)} Änderungen" if aenderungen else "unverändert"))
+        for zeile in aenderungen:
+            print(f"  {zeile}")
+    return 1 if fehler else 0
+
+def _index(args):
+    import bamberg_muell_index
+    return bamberg_muell_index.run_index(args)
+
+def _erinnern(args):
+    import bamberg_muell_erinnerung
+    return bamberg_muell_erinnerung.run_erinnern(args)
+
+def _statistik(args):
+    import bamberg_muell_statistik
+    return bamberg_muell_statistik.run_statistik(args)
+
+def _serve(args):
+    import bamberg_muell_server
+    return bamberg_muell_server.serve(args)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bamberg_muell.py", description="Bamberg Abfuhrtermine. "
+                                     "Ohne Befehl wird die grafische Oberfläche gestartet.")
+    parser.add_argument("--url", default=API_URL, help="Servlet-URL (z.B. fake_servlet.py)")
+    parser.add_argument("--cache", help=f"Cache-Datei (Standard: {CACHE_FILE})")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Zeitmessungen pro Phase als JSON-Zeilen anhängen")
+    commands = parser.add_subparsers(dest="befehl")
+    
+    adresse = argparse.ArgumentParser(add_help=False)
+    adresse.add_argument("strasse")
+    adresse.add_argument("hnr")
+    adresse.add_argument("zusatz", nargs="?", default="")
+    adresse.add_argument("--typ", help="nur Abfallarten, die diesen Text enthalten")
+    adresse.add_argument("--offline", action="store_true", help="nur den Cache verwenden")
+    
+    cmd = commands.add_parser("next", parents=[adresse], help="nächste Abholung je Abfallart")
+    cmd.add_argument("--ab", type=_datum_arg, help="Stichtag TT.MM.JJJJ (Standard: heute)")
+    cmd.set_defaults(func=cmd_next)
+    
+    cmd = commands.add_parser("list", parents=[adresse], help="alle Termine auflisten")
+    cmd.add_argument("--ab", type=_datum_arg, help="erst ab TT.MM.JJJJ")
+    cmd.set_defaults(func=cmd_list)
+    
+    cmd = commands.add_parser("export", help="Termine als CSV/JSON/iCal/TXT/PDF ausgeben, ohne Adresse "
+                              "für alle letzten Anfragen oder --adressen")
+    cmd.add_argument("strasse", nargs="?")
+    cmd.add_argument("hnr", nargs="?")
+    cmd.add_argument("zusatz", nargs="?", default="")
+    cmd.add_argument("--adressen", metavar="CSV", help="Adressen (strasse;hnr;zusatz), - für stdin")
+    cmd.add_argument("--typ", help="nur Abfallarten, die diesen Text enthalten")
+    cmd.add_argument("--offline", action="store_true", help="nur den Cache verwenden")
+    cmd.add_argument("--format", choices=["csv", "json", "ical", "txt", "pdf"], default="csv")
+    cmd.add_argument("--alarm", type=int, metavar="STUNDEN", help="iCal: Erinnerung so viele Stunden vor dem Tag")
+    cmd.add_argument("-o", "--out", help="Datei statt stdout")
+    cmd.set_defaults(func=cmd_export)
+    
+    cmd = commands.add_parser("sync", help="letzte Adressen neu laden und Änderungen anzeigen")
+    cmd.add_argument("strasse", nargs="?", help="nur diese Adresse statt der letzten Anfragen")
+    cmd.add_argument("hnr", nargs="?")
+    cmd.add_argument("zusatz", nargs="?", default="")
+    cmd.set_defaults(func=cmd_sync)
+    
+    cmd = commands.add_parser("bulk", help="Adressen (strasse;hnr;zusatz) aus CSV abrufen")
+    cmd.add_argument("bulk", metavar="CSV")
+    cmd.add_argument("--out", help="Ergebnis-CSV statt stdout")
+    cmd.add_argument("--workers", type=int, default=8)
+    cmd.add_argument("--per-host", type=int, default=4, help="max. gleichzeitige Anfragen pro Server")
+    cmd.add_argument("--retries", type=int, default=2)
+    cmd.set_defaults(func=run_bulk)
+    
+    cmd = commands.add_parser("index", help="Straßenverzeichnis (und optional alle Termine) laden")
+    cmd.add_argument("--db", default="strassen.db", help="nur strassen.db wird automatisch verwendet")
+    cmd.add_argument("--buchstaben", default="ABCDEFGHIJKLMNOPQRSTUVWXYZ", help="Ort-Buchstaben")
+    cmd.add_argument("--ohne-hausnummern", action="store_true")
+    cmd.add_argument("--termine", action="store_true", help="Termine aller Adressen vorberechnen")
+    cmd.add_argument("--workers", type=int, default=4)
+    cmd.set_defaults(func=_index)
+    
+    cmd = commands.add_parser("erinnern", help="am Vorabend an Abholungen der letzten Adressen erinnern")
+    cmd.add_argument("--konsole", action="store_true", help="nur auf der Konsole statt als Desktop-Meldung")
+    cmd.add_argument("--staffel", type=float, default=60, help="Sekunden zwischen zwei Abrufen")
+    cmd.set_defaults(func=_erinnern)
+    
+    cmd = commands.add_parser("statistik", help="Auswertung über alle Adressen im Cache oder Straßenverzeichnis")
+    cmd.add_argument("--index", action="store_true", help="vorberechnete Termine aus dem Straßenverzeichnis")
+    cmd.add_argument("--db", help="Straßenverzeichnis (Standard: strassen.db)")
+    cmd.add_argument("--gruppen", type=int, default=10, help="so viele Gruppen gleicher Pläne zeigen")
+    cmd.set_defaults(func=_statistik)
+    
+    cmd = commands.add_parser("serve", help="lokalen Termine-Dienst (JSON/iCal) starten")
+    cmd.add_argument("--host", default="127.0.0.1")
+    cmd.add_argument("--port", type=int, default=8080)
+    cmd.add_argument("--rate", type=float, default=1.0, help="max. Abrufe pro Sekunde bei der Stadt")
+    cmd.set_defaults(func=_serve)
+    
+    args = parser.parse_args(argv)
+    if args.trace:
+        add_hook(TraceDatei(args.trace))
+    if args.befehl is None:
+        # tkinter erst hier laden, die bibliothek und die befehle kommen ohne aus
+        import bamberg_muell_gui
+        bamberg_muell_gui.main()
+        return 0
+    try:
+        return args.func(args)
+    except (LookupError, ValueError, requests.RequestException) as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
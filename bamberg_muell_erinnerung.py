@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# erinnert am vorabend an die abholungen aller adressen der letzten anfragen
+# und lädt deren termine gestaffelt neu:  python3 bamberg_muell.py erinnern
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as uhrzeit
+import heapq
+import itertools
+import json
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from bamberg_muell import API_URL, CACHE_TTL, TermineCache, get_termine, offenes_index, WOCHENTAGE
+
+ERINNERUNG_UHRZEIT = uhrzeit(18, 0)  # am vorabend der abholung
+STAFFEL = 60  # sekunden mindestabstand zwischen zwei hintergrund-abrufen
+FEHLER_PAUSE = 15 * 60  # nach einem fehlgeschlagenen abruf
+MAX_SCHLAF = 3600  # nach standby oder uhrzeitsprüngen spätestens neu rechnen
+
+
+def desktop_meldung(titel, text):
+    # notify-send (linux) bzw. osascript (macos), sonst auf die konsole
+    try:
+        if shutil.which("notify-send"):
+            subprocess.run(["notify-send", titel, text], check=True, timeout=5)
+            return
+        if shutil.which("osascript"):
+            skript = (f"display notification {json.dumps(text, ensure_ascii=False)} "
+                      f"with title {json.dumps(titel, ensure_ascii=False)}")
+            subprocess.run(["osascript", "-e", skript], check=True, timeout=5)
+            return
+    except (OSError, subprocess.SubprocessError):
+        pass
+    print(f"{titel}: {text}", flush=True)
+
+
+def adresse_name(adresse):
+    return f"{adresse['strasse']} {adresse['hnr']}{adresse['zusatz']}"
+
+
+class Planer:
+    # ein min-heap aus (fällig, nr, art, key, marke, daten) für erinnerungen und
+    # abrufe aller adressen. der thread schläft bis zum ersten eintrag; neue
+    # einträge und stop() wecken ihn über die condition. überholte einträge
+    # bleiben im heap und werden beim herausnehmen an der marke erkannt
+    def __init__(self, cache, melden=desktop_meldung, abrufen=None, url=API_URL,
+                 intervall=CACHE_TTL, staffel=STAFFEL, index=None):
+        self.cache = cache
+        self.index = index
+        self.melden = melden
+        self.abrufen = abrufen or self._abrufen
+        self.url = url
+        self.intervall = intervall
+        self.staffel = staffel
+        self._cond = threading.Condition()
+        self._heap = []
+        self._nr = itertools.count()
+        self._adressen = {}
+        self._marken = {}
+        self._gemeldet = set()
+        self._letzter_abruf = 0.0
+        self._stop = False
+        self._thread = None
+        self._executor = None
+        self._offen = set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="planer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._executor is not None:
+            # wartende abrufe selbst abbrechen, cancel_futures gibt es erst ab 3.9
+            for future in list(self._offen):
+                future.cancel()
+            self._executor.shutdown(wait=False)
+
+    def join(self):
+        self._thread.join()
+
+    def _push(self, faellig, art, key, marke, daten=None):
+        heapq.heappush(self._heap, (faellig, next(self._nr), art, key, marke, daten))
+        self._cond.notify()
+
+    def _plane_abruf(self, key, faellig):
+        with self._cond:
+            if key in self._adressen:
+                marke = self._marken[('abruf', key)] = object()
+                self._push(faellig, 'abruf', key, marke)
+
+    def setze_adressen(self, adressen):
+        # neue adressen sofort mit den terminen aus dem cache einplanen,
+        # entfernte verlieren ihre marken und fallen aus dem heap
+        adressen = {TermineCache.key(a['strasse'], a['hnr'], a['zusatz']): a for a in adressen}
+        with self._cond:
+            for key in set(self._adressen) - set(adressen):
+                self._marken.pop(('abruf', key), None)
+                self._marken.pop(('erinnerung', key), None)
+            neu = [key for key in adressen if key not in self._adressen]
+            self._adressen = adressen
+        jetzt = time.time()
+        for key in neu:
+            cached = self.cache.get(key)
+            if cached:
+                self.setze_termine(key, cached['termine'])
+            self._plane_abruf(key, cached['fetched'] + self.intervall if cached else jetzt)
+
+    def setze_termine(self, key, termine):
+        # erinnerungen der adresse neu aufbauen, ein eintrag pro abholtag
+        morgen = date.today().toordinal() + 1
+        tage = {}
+        for t in termine:
+            if t.ordinal >= morgen:
+                tage.setdefault(t.ordinal, []).append(t.typ)
+        with self._cond:
+            if key not in self._adressen:
+                return
+            marke = self._marken[('erinnerung', key)] = object()
+            for ordinal, typen in tage.items():
+                vorabend = datetime.combine(date.fromordinal(ordinal - 1), ERINNERUNG_UHRZEIT)
+                self._push(vorabend.timestamp(), 'erinnerung', key, marke, (ordinal, typen))
+
+    def naechste_erinnerung(self):
+        # (zeitpunkt, adresse, datum, typen) des frühesten gültigen eintrags
+        with self._cond:
+            eintraege = [e for e in self._heap
+                         if e[2] == 'erinnerung' and self._marken.get(('erinnerung', e[3])) is e[4]]
+            if not eintraege:
+                return None
+            faellig, _, _, key, _, (ordinal, typen) = min(eintraege)
+            return faellig, self._adressen[key], date.fromordinal(ordinal), typen
+
+    def _naechste_aufgabe(self):
+        with self._cond:
+            while not self._stop:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                faellig, _, art, key, marke, daten = self._heap[0]
+                if self._marken.get((art, key)) is not marke:
+                    heapq.heappop(self._heap)
+                    continue
+                jetzt = time.time()
+                if faellig > jetzt:
+                    self._cond.wait(min(faellig - jetzt, MAX_SCHLAF))
+                    continue
+                if art == 'abruf' and jetzt < self._letzter_abruf + self.staffel:
+                    # fällige abrufe nicht gleichzeitig, sondern im abstand `staffel`
+                    heapq.heapreplace(self._heap, (self._letzter_abruf + self.staffel, next(self._nr),
+                                                   art, key, marke, daten))
+                    continue
+                heapq.heappop(self._heap)
+                if art == 'abruf':
+                    self._letzter_abruf = jetzt
+                return art, key, self._adressen[key], daten
+            return None
+
+    def _run(self):
+        while True:
+            aufgabe = self._naechste_aufgabe()
+            if aufgabe is None:
+                return
+            art, key, adresse, daten = aufgabe
+            if art == 'abruf':
+                future = self.abrufen(adresse)
+                future.add_done_callback(lambda f, key=key: self._abgerufen(key, f))
+            elif (key, daten[0]) not in self._gemeldet:
+                self._gemeldet.add((key, daten[0]))
+                tag = date.fromordinal(daten[0])
+                try:
+                    self.melden(f"Morgen Abholung ({WOCHENTAGE[tag.weekday()]} {tag.strftime('%d.%m.')})",
+                                f"{adresse_name(adresse)}: {', '.join(daten[1])}")
+                except Exception as e:
+                    print(f"Erinnerung fehlgeschlagen: {e}", file=sys.stderr)
+
+    def _abgerufen(self, key, future):
+        jetzt = time.time()
+        if future.cancelled():
+            # von einer anfrage im vordergrund verdrängt
+            self._plane_abruf(key, jetzt + self.staffel)
+        elif future.exception() is not None:
+            self._plane_abruf(key, jetzt + FEHLER_PAUSE)
+        else:
+            self.setze_termine(key, future.result())
+            self._plane_abruf(key, jetzt + self.intervall)
+
+    def _abrufen(self, adresse):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        future = self._executor.submit(self._hole, adresse)
+        self._offen.add(future)
+        future.add_done_callback(self._offen.discard)
+        return future
+
+    def _hole(self, adresse):
+        # ort aus dem straßenverzeichnis wie bei lade_termine, sonst rät get_termine
+        ort = self.index.ort(adresse['strasse']) if self.index is not None else None
+        termine = get_termine(adresse['strasse'], int(adresse['hnr']), adresse['zusatz'], url=self.url, ort=ort)
+        self.cache.put(TermineCache.key(adresse['strasse'], adresse['hnr'], adresse['zusatz']), termine)
+        return termine
+
+
+def run_erinnern(args):
+    cache = TermineCache(args.cache) if args.cache else TermineCache()
+    adressen = cache.history()
+    if not adressen:
+        print("Keine Adressen in den letzten Anfragen", file=sys.stderr)
+        return 1
+    melden = (lambda titel, text: print(f"{titel}: {text}", flush=True)) if args.konsole else desktop_meldung
+    planer = Planer(cache, melden, url=args.url, staffel=args.staffel, index=offenes_index())
+    planer.setze_adressen(adressen)
+    naechste = planer.naechste_erinnerung()
+    print(f"{len(adressen)} Adressen", file=sys.stderr)
+    if naechste:
+        faellig, adresse, tag, typen = naechste
+        print(f"Nächste Erinnerung {datetime.fromtimestamp(faellig).strftime('%d.%m. %H:%M')}: "
+              f"{adresse_name(adresse)}, {', '.join(typen)}", file=sys.stderr)
+    try:
+        planer.start().join()
+    except KeyboardInterrupt:
+        planer.stop()
+    return 0
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# export der termine als iCal, CSV, JSON, TXT oder PDF, direkt aus den daten
+# und adresse für adresse geschrieben:
+#   python3 bamberg_muell.py export Egelseestraße 114 --format pdf -o termine.pdf
+#   python3 bamberg_muell.py export --adressen adressen.csv --format ical --alarm 6
+from datetime import datetime
+import csv
+import json
+import sys
+
+from bamberg_muell import ical_events, ical_falten
+
+FORMATE = ["csv", "json", "ical", "txt", "pdf"]
+ENDUNGEN = {"csv": "csv", "json": "json", "ical": "ics", "txt": "txt", "pdf": "pdf"}
+
+
+def text_zeilen(termine, adresse, erstellt=None):
+    # zeilen der druckvorschau
+    yield "=" * 60
+    yield "        BAMBERG ABFUHRTERMINE"
+    yield "=" * 60
+    yield ""
+    yield f"Adresse: {adresse}"
+    yield f"Erstellt: {(erstellt or datetime.now()).strftime('%d.%m.%Y %H:%M')}"
+    yield ""
+    yield "-" * 60
+    yield ""
+    letztes = None
+    for t in termine:
+        if letztes is not None and letztes != t.ordinal:
+            yield ""
+        yield f"{t.datum:12} | {t.typ}"
+        letztes = t.ordinal
+    yield ""
+    yield "=" * 60
+    yield ""
+    yield "Entwickelt von Oliver Schlegel"
+
+
+class PdfDatei:
+    # minimales pdf: a4, courier 10pt, jede seite wird geschrieben, sobald
+    # sie voll ist. objekte 1-3 (katalog, seitenbaum, schrift) sind reserviert
+    ZEILEN = 64
+
+    def __init__(self, out):
+        self.out = out
+        self._pos = 0
+        self._offsets = {}
+        self._seiten = []
+        self._zeilen = []
+        self._nr = 3
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._objekt(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+    def _write(self, data):
+        self.out.write(data)
+        self._pos += len(data)
+
+    def _objekt(self, nr, inhalt):
+        self._offsets[nr] = self._pos
+        self._write(b"%d 0 obj\n" % nr + inhalt + b"\nendobj\n")
+
+    def zeile(self, text):
+        self._zeilen.append(text)
+        if len(self._zeilen) == self.ZEILEN:
+            self.neue_seite()
+
+    def neue_seite(self):
+        if not self._zeilen:
+            return
+        text = b"".join(b"(" + z.encode("cp1252", "replace").replace(b"\\", b"\\\\")
+                        .replace(b"(", b"\\(").replace(b")", b"\\)") + b") Tj T*\n" for z in self._zeilen)
+        stream = b"BT /F1 10 Tf 12 TL 50 800 Td\n" + text + b"ET"
+        inhalt, seite = self._nr + 1, self._nr + 2
+        self._nr = seite
+        self._objekt(inhalt, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self._objekt(seite, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % inhalt)
+        self._seiten.append(seite)
+        self._zeilen = []
+
+    def close(self):
+        self.neue_seite()
+        kids = b" ".join(b"%d 0 R" % s for s in self._seiten)
+        self._objekt(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._seiten)))
+        self._objekt(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._pos
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % (self._nr + 1))
+        self._write(b"".join(b"%010d 00000 n \n" % self._offsets[nr] for nr in range(1, self._nr + 1)))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._nr + 1, xref))
+
+
+def exportiere(quellen, format, out, mehrere=False, alarm=None, titel="Abfuhrtermine"):
+    # quellen: (adresse, termine)-paare, auch als generator. pdf schreibt in
+    # eine binärdatei, alle anderen formate in eine textdatei
+    if format == "ical":
+        out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//bamberg-muellkalender//DE\r\n"
+                  + ical_falten(f"X-WR-CALNAME:{titel}") + "\r\n")
+        for adresse, termine in quellen:
+            out.writelines(line + "\r\n" for line in ical_events(termine, f"Abfuhrtermine {adresse}", alarm,
+                                                                  adresse if mehrere else None))
+        out.write("END:VCALENDAR\r\n")
+    elif format == "json":
+        # ein termin pro zeile, damit große exporte lesbar bleiben
+        out.write("[")
+        for i, (adresse, termine) in enumerate(quellen):
+            eintraege = ",\n ".join(json.dumps({'datum': t.date.isoformat(), 'typ': t.typ, 'art': t.art.id},
+                                               ensure_ascii=False)
+                                    for t in termine)
+            if mehrere:
+                out.write(("," if i else "") + f"\n {{\"adresse\": {json.dumps(adresse, ensure_ascii=False)}, "
+                          f"\"termine\": [\n {eintraege}\n ]}}")
+            else:
+                out.write(f"\n {eintraege}" if eintraege else "")
+        out.write("\n]\n")
+    elif format == "csv":
+        writer = csv.writer(out, delimiter=';')
+        writer.writerow(["adresse", "datum", "typ", "art"] if mehrere else ["datum", "typ", "art"])
+        for adresse, termine in quellen:
+            if mehrere:
+                writer.writerows((adresse, t.datum, t.typ, t.art.id) for t in termine)
+            else:
+                writer.writerows((t.datum, t.typ, t.art.id) for t in termine)
+    elif format == "txt":
+        erstellt = datetime.now()
+        for i, (adresse, termine) in enumerate(quellen):
+            if i:
+                out.write("\n\f")
+            out.write("\n".join(text_zeilen(termine, adresse, erstellt)) + "\n")
+    elif format == "pdf":
+        pdf = PdfDatei(out)
+        erstellt = datetime.now()
+        for adresse, termine in quellen:
+            for zeile in text_zeilen(termine, adresse, erstellt):
+                pdf.zeile(zeile)
+            pdf.neue_seite()
+        pdf.close()
+    else:
+        raise ValueError(f"Unbekanntes Format: {format}")
+
+
+def oeffne(path, format):
+    # ziel-datei oder stdout im passenden modus
+    if format == "pdf":
+        return open(path, 'wb') if path else sys.stdout.buffer
+    return open(path, 'w', newline='', encoding='utf-8') if path else sys.stdout
@@ -0,0 +1,868 @@
+#!/usr/bin/env python3
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, Future
+from difflib import SequenceMatcher
+import json
+import os
+import time
+import requests
+
+from bamberg_muell import (HISTORY_FILE, SERVICE_URL, TRACE_FILE, TermineCache, TermineClient, ServiceClient,
+                           offenes_index, diff_termine, beschreibe_aenderungen, PhasenStatistik, TraceDatei,
+                           add_hook, span, melde_span, CircuitOpen, VeralteteTermine, abfallart,
+                           abfallarten)
+from bamberg_muell_erinnerung import Planer, desktop_meldung
+from bamberg_muell_export import ENDUNGEN, exportiere, oeffne, text_zeilen
+from bamberg_muell_statistik import MONATE, Statistik, aus_cache, bericht
+
+THEMES = {
+    'light': {
+        'bg': '#fafafa', 'card': 'white', 'primary': '#2196F3',
+        'primary_dark': '#1976D2', 'text': '#333', 'text_secondary': '#666',
+        'header': '#f5f5f5', 'status_bg': '#f5f5f5', 'input_bg': 'white',
+        'list_select': '#E3F2FD', 'border': '#ddd'
+    },
+    'dark': {
+        'bg': '#1e1e1e', 'card': '#2d2d2d', 'primary': '#64B5F6',
+        'primary_dark': '#42A5F5', 'text': '#e0e0e0', 'text_secondary': '#b0b0b0',
+        'header': '#424242', 'status_bg': '#2d2d2d', 'input_bg': '#3d3d3d',
+        'list_select': '#1976D2', 'border': '#404040'
+    },
+}
+
+RENDER_CHUNK = 200  # treeview-zeilen pro after()-durchlauf
+
+class SplashScreen:
+    def __init__(self, parent):
+        self.splash = tk.Toplevel()
+        self.splash.title("Bamberg Abfuhrtermine")
+        self.splash.overrideredirect(True)
+        
+        frame = tk.Frame(self.splash, bg="#2196F3", padx=60, pady=40)
+        frame.pack()
+        
+        title = tk.Label(frame, text="🗑️ Bamberg Abfuhrtermine", 
+                        font=("Arial", 24, "bold"), bg="#2196F3", fg="white")
+        title.pack(pady=(0, 20))
+        
+        subtitle = tk.Label(frame, text="Abfuhrkalender für die Stadt Bamberg", 
+                           font=("Arial", 12), bg="#2196F3", fg="white")
+        subtitle.pack(pady=(0, 30))
+        
+        loading = tk.Label(frame, text="Wird geladen...", 
+                          font=("Arial", 11), bg="#2196F3", fg="white")
+        loading.pack(pady=(0, 20))
+        
+        author = tk.Label(frame, text="Entwickelt von Oliver Schlegel", 
+                         font=("Arial", 9), bg="#2196F3", fg="#E3F2FD")
+        author.pack()
+        
+        self.splash.update_idletasks()
+        x = (self.splash.winfo_screenwidth() // 2) - (self.splash.winfo_width() // 2)
+        y = (self.splash.winfo_screenheight() // 2) - (self.splash.winfo_height() // 2)
+        self.splash.geometry(f"+{x}+{y}")
+        
+        self.splash.update()
+    
+    def close(self):
+        self.splash.destroy()
+
+class AbfallApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Bamberg Abfuhrtermine")
+        self.root.geometry("900x650")
+        self.cache = TermineCache()
+        self.history = self.load_history()
+        self.current_termine = []
+        self.index = offenes_index()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._laufend = {}
+        self._anfrage_gen = 0
+        self.client = ServiceClient(SERVICE_URL) if SERVICE_URL else TermineClient()
+        self.dark_mode = False
+        self.lazy_render = tk.BooleanVar(value=False)
+        self._render_gen = 0
+        self._style_cache = {}
+        self.phasen = add_hook(PhasenStatistik())
+        
+        # menubar
+        menubar = tk.Menu(root)
+        root.config(menu=menubar)
+        
+        file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Datei", menu=file_menu)
+        file_menu.add_command(label="📄 Drucken", command=self.drucken)
+        file_menu.add_separator()
+        file_menu.add_command(label="🗂️ Cache anzeigen", command=self.zeige_cache)
+        file_menu.add_command(label="🧹 Cache leeren", command=self.cache_leeren)
+        file_menu.add_separator()
+        file_menu.add_command(label="Beenden", command=root.quit)
+        
+        view_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Ansicht", menu=view_menu)
+        view_menu.add_command(label="🌙 Dark Mode", command=self.toggle_dark_mode)
+        view_menu.add_command(label="📊 Statistik", command=self.zeige_statistik)
+        view_menu.add_command(label="⏱️ Zeitmessung", command=self.zeige_zeitmessung)
+        view_menu.add_checkbutton(label="Lange Listen beim Scrollen nachladen", variable=self.lazy_render)
+        
+        self.build_ui()
+        self.zeige_letzte_adresse()
+        
+        # erinnerungen und gestaffelte aktualisierung für alle letzten adressen
+        self.planer = Planer(self.cache, self.erinnern, self.hintergrund_abruf)
+        self.planer.setze_adressen(self.history)
+        self.planer.start()
+    
+    def get_colors(self):
+        return THEMES['dark' if self.dark_mode else 'light']
+    
+    def themed(self, widget, **roles):
+        # merkt sich, welche option welche theme-farbe bekommt (z.B. bg='card'),
+        # damit apply_theme die farben ohne neuaufbau tauschen kann
+        c = self.get_colors()
+        widget.configure(**{option: c[key] for option, key in roles.items()})
+        self._themed.append((widget, roles))
+        return widget
+    
+    def style_config(self):
+        # ttk-style-konfiguration wird pro theme nur einmal berechnet
+        theme = 'dark' if self.dark_mode else 'light'
+        if theme not in self._style_cache:
+            c = THEMES[theme]
+            self._style_cache[theme] = {
+                'Custom.Treeview': dict(font=('Segoe UI', 9), rowheight=30, background=c['card'],
+                                        fieldbackground=c['card'], foreground=c['text']),
+                'Custom.Treeview.Heading': dict(font=('Segoe UI', 10, 'bold'),
+                                                background=c['header'], foreground=c['text']),
+            }
+        return self._style_cache[theme]
+    
+    def apply_theme(self):
+        c = self.get_colors()
+        for widget, roles in self._themed:
+            widget.configure(**{option: c[key] for option, key in roles.items()})
+        for name, config in self.style_config().items():
+            self.style.configure(name, **config)
+        # colors for waste types, ein tag pro abfallart-id
+        for art in abfallarten():
+            self.tree.tag_configure(art.id, **(art.dunkel if self.dark_mode else art.hell))
+    
+    def build_ui(self):
+        self._themed = []
+        
+        main_frame = self.themed(tk.Frame(self.root), bg='bg')
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        # left panel
+        left_panel = self.themed(tk.Frame(main_frame, width=300), bg='bg')
+        left_panel.pack(side=tk.LEFT, fill=tk.BOTH, padx=(0, 10))
+        left_panel.pack_propagate(False)
+        
+        # input card
+        input_card = self.themed(tk.Frame(left_panel, relief='solid', bd=1, highlightthickness=1),
+                                 bg='card', highlightbackground='border')
+        input_card.pack(fill=tk.X, pady=(0, 15))
+        
+        title_frame = self.themed(tk.Frame(input_card, height=45), bg='primary')
+        title_frame.pack(fill=tk.X)
+        title_label = self.themed(tk.Label(title_frame, text="🏠 Adresse eingeben", 
+                                           font=('Segoe UI', 11, 'bold'), 
+                                           fg='white', anchor='w'), bg='primary')
+        title_label.pack(side=tk.LEFT, padx=15, pady=10)
+        
+        fields_frame = self.themed(tk.Frame(input_card, padx=15, pady=15), bg='card')
+        fields_frame.pack(fill=tk.BOTH)
+        
+        entries = []
+        for text in ("Straße", "Hausnummer", "Zusatz (optional)"):
+            self.themed(tk.Label(fields_frame, text=text, font=('Segoe UI', 9)),
+                        bg='card', fg='text_secondary').pack(anchor='w', pady=(0, 5))
+            entry = self.themed(tk.Entry(fields_frame, font=('Segoe UI', 10), relief='solid', bd=1),
+                                bg='input_bg', fg='text')
+            entry.pack(fill=tk.X, ipady=6, pady=(0, 15))
+            entries.append(entry)
+        self.strasse_entry, self.hnr_entry, self.zusatz_entry = entries
+        if self.index is not None:
+            self.setup_autocomplete()
+        
+        self.suchen_btn = self.themed(tk.Button(fields_frame, text="🔍  Termine abrufen", 
+                                                command=self.suchen,
+                                                font=('Segoe UI', 10, 'bold'),
+                                                fg='white',
+                                                relief='flat', cursor='hand2',
+                                                padx=20, pady=10), bg='primary')
+        self.suchen_btn.pack(fill=tk.X)
+        self.suchen_btn.bind('<Enter>', lambda e: self.suchen_btn.config(bg=self.get_colors()['primary_dark']))
+        self.suchen_btn.bind('<Leave>', lambda e: self.suchen_btn.config(bg=self.get_colors()['primary']))
+        
+        # history card
+        history_card = self.themed(tk.Frame(left_panel, relief='solid', bd=1, highlightthickness=1),
+                                   bg='card', highlightbackground='border')
+        history_card.pack(fill=tk.BOTH, expand=True)
+        
+        history_title_frame = self.themed(tk.Frame(history_card, height=40), bg='header')
+        history_title_frame.pack(fill=tk.X)
+        history_title = self.themed(tk.Label(history_title_frame, text="📋 Letzte Anfragen", 
+                                             font=('Segoe UI', 10, 'bold'), anchor='w'),
+                                    bg='header', fg='text')
+        history_title.pack(side=tk.LEFT, padx=15, pady=10)
+        
+        history_list_frame = self.themed(tk.Frame(history_card), bg='card')
+        history_list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        self.history_listbox = self.themed(tk.Listbox(history_list_frame, 
+                                                      font=('Segoe UI', 9),
+                                                      relief='flat',
+                                                      highlightthickness=0),
+                                           selectbackground='list_select',
+                                           selectforeground='primary_dark',
+                                           bg='card', fg='text')
+        self.history_listbox.pack(fill=tk.BOTH, expand=True)
+        self.history_listbox.bind('<Double-Button-1>', self.load_from_history)
+        
+        self.update_history_list()
+        
+        # right panel
+        right_panel = self.themed(tk.Frame(main_frame, relief='solid', bd=1, highlightthickness=1),
+                                  bg='card', highlightbackground='border')
+        right_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        result_header = self.themed(tk.Frame(right_panel, height=45), bg='header')
+        result_header.pack(fill=tk.X)
+        result_title = self.themed(tk.Label(result_header, text="📅 Abfuhrtermine", 
+                                            font=('Segoe UI', 11, 'bold'), anchor='w'),
+                                   bg='header', fg='text')
+        result_title.pack(side=tk.LEFT, padx=15, pady=10)
+        
+        table_frame = self.themed(tk.Frame(right_panel), bg='card')
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        self.style = ttk.Style()
+        self.style.theme_use('clam')
+        
+        self.tree = ttk.Treeview(table_frame, 
+                                columns=("datum", "typ"), 
+                                show="headings",
+                                style='Custom.Treeview')
+        self.tree.heading("datum", text="📅 Datum")
+        self.tree.heading("typ", text="🗑️ Abfallart")
+        self.tree.column("datum", width=120, anchor='center')
+        self.tree.column("typ", width=400)
+        
+        self.tree_scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=self._tree_scrolled)
+        
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # zustand der dargestellten zeilen, für diff und chunkweises einfügen
+        self._zeilen = []
+        self._zeilen_ids = []
+        self._render_gen += 1
+        self._render_fortsetzen = None
+        
+        # status bar
+        status_frame = self.themed(tk.Frame(self.root, height=35), bg='status_bg')
+        status_frame.pack(fill=tk.X, side=tk.BOTTOM)
+        
+        self.status = self.themed(tk.Label(status_frame, text="Bereit", 
+                                           font=('Segoe UI', 9), anchor='w'),
+                                  bg='status_bg', fg='text_secondary')
+        self.status.pack(side=tk.LEFT, padx=15, pady=8)
+        
+        self.queue_label = self.themed(tk.Label(status_frame, text="", font=('Segoe UI', 9), anchor='e'),
+                                       bg='status_bg', fg='text_secondary')
+        self.queue_label.pack(side=tk.RIGHT, padx=15, pady=8)
+        
+        self.apply_theme()
+    
+    def setup_autocomplete(self):
+        self.vorschlag_list = self.themed(tk.Listbox(self.strasse_entry.master, font=('Segoe UI', 9),
+                                                     relief='solid', bd=1, highlightthickness=0),
+                                          bg='input_bg', fg='text',
+                                          selectbackground='list_select', selectforeground='primary_dark')
+        self.strasse_entry.bind('<KeyRelease>', self.zeige_vorschlaege)
+        self.strasse_entry.bind('<Down>', self._vorschlag_fokus)
+        self.strasse_entry.bind('<Escape>', lambda e: self.vorschlag_list.place_forget())
+        self.vorschlag_list.bind('<Return>', self.vorschlag_uebernehmen)
+        self.vorschlag_list.bind('<Double-Button-1>', self.vorschlag_uebernehmen)
+        self.vorschlag_list.bind('<Escape>', lambda e: (self.vorschlag_list.place_forget(),
+                                                        self.strasse_entry.focus_set()))
+    
+    def zeige_vorschlaege(self, event):
+        if event.keysym in ('Down', 'Up', 'Return', 'Escape', 'Tab'):
+            return
+        text = self.strasse_entry.get().strip()
+        vorschlaege = self.index.vorschlaege(text, 6) if text else []
+        if not vorschlaege or vorschlaege == [text]:
+            self.vorschlag_list.place_forget()
+            return
+        self.vorschlag_list.delete(0, tk.END)
+        for name in vorschlaege:
+            self.vorschlag_list.insert(tk.END, name)
+        self.vorschlag_list.config(height=len(vorschlaege))
+        self.vorschlag_list.place(in_=self.strasse_entry, relx=0, rely=1, relwidth=1)
+        self.vorschlag_list.lift()
+    
+    def _vorschlag_fokus(self, event):
+        if self.vorschlag_list.winfo_ismapped():
+            self.vorschlag_list.focus_set()
+            self.vorschlag_list.selection_clear(0, tk.END)
+            self.vorschlag_list.selection_set(0)
+            self.vorschlag_list.activate(0)
+    
+    def vorschlag_uebernehmen(self, event=None):
+        selection = self.vorschlag_list.curselection()
+        if selection:
+            self.strasse_entry.delete(0, tk.END)
+            self.strasse_entry.insert(0, self.vorschlag_list.get(selection[0]))
+        self.vorschlag_list.place_forget()
+        self.hnr_entry.focus_set()
+    
+    def aus_index(self, strasse, hnr, zusatz):
+        # vorberechnete termine aus dem straßenverzeichnis wie einen cache-eintrag behandeln
+        if self.index is None:
+            return None
+        termine = self.index.termine(strasse, hnr, zusatz)
+        if termine is None:
+            return None
+        return {'termine': termine, 'fetched': self.index.stand("termine")}
+    
+    def load_history(self):
+        history = self.cache.history()
+        # einmalige übernahme der früheren history.json
+        if not history and os.path.exists(HISTORY_FILE):
+            try:
+                with open(HISTORY_FILE, 'r') as f:
+                    history = json.load(f)
+                self.cache.set_history(history[-10:])
+            except (OSError, ValueError):
+                return []
+        return history
+    
+    def save_history(self):
+        self.cache.set_history(self.history[-10:])
+        self.planer.setze_adressen(self.history[-10:])
+    
+    def zeige_letzte_adresse(self):
+        # letzten bekannten stand sofort zeigen, ohne netzwerk
+        if not self.history:
+            return
+        entry = self.history[-1]
+        for widget, key in ((self.strasse_entry, 'strasse'), (self.hnr_entry, 'hnr'), (self.zusatz_entry, 'zusatz')):
+            widget.delete(0, tk.END)
+            widget.insert(0, entry[key])
+        cached = self.cache.get(TermineCache.key(entry['strasse'], entry['hnr'], entry['zusatz']))
+        if cached:
+            stand = datetime.fromtimestamp(cached['fetched']).strftime('%d.%m.%Y %H:%M')
+            self.zeige_termine(cached['termine'], f"📂 {len(cached['termine'])} Termine (Stand {stand})")
+    
+    def update_history_list(self):
+        self.history_listbox.delete(0, tk.END)
+        for entry in reversed(self.history[-10:]):
+            text = f"{entry['strasse']} {entry['hnr']}{entry['zusatz']}"
+            self.history_listbox.insert(tk.END, text)
+    
+    def load_from_history(self, event):
+        selection = self.history_listbox.curselection()
+        if selection:
+            idx = len(self.history) - 1 - selection[0]
+            if 0 <= idx < len(self.history):
+                entry = self.history[idx]
+                self.strasse_entry.delete(0, tk.END)
+                self.strasse_entry.insert(0, entry['strasse'])
+                self.hnr_entry.delete(0, tk.END)
+                self.hnr_entry.insert(0, entry['hnr'])
+                self.zusatz_entry.delete(0, tk.END)
+                self.zusatz_entry.insert(0, entry['zusatz'])
+                self.suchen()
+    
+    def suchen(self):
+        strasse = self.strasse_entry.get().strip()
+        hnr = self.hnr_entry.get().strip()
+        zusatz = self.zusatz_entry.get().strip()
+        
+        if not strasse or not hnr:
+            messagebox.showerror("Fehler", "Bitte Straße und Hausnummer eingeben")
+            return
+        
+        try:
+            hnr_int = int(hnr)
+        except ValueError:
+            messagebox.showerror("Fehler", "Hausnummer muss eine Zahl sein")
+            return
+        
+        # mit straßenverzeichnis: tippfehler abfangen, bevor die stadt gefragt wird
+        if self.index is not None:
+            self.vorschlag_list.place_forget()
+            offiziell = self.index.strasse(strasse)
+            if offiziell is None or not self.index.kennt(offiziell, hnr, zusatz):
+                vorschlaege = self.index.vorschlaege(strasse[:4], 5)
+                hinweis = "\n\nMeinten Sie:\n" + "\n".join(vorschlaege) if vorschlaege else ""
+                messagebox.showerror("Fehler", f"{strasse} {hnr}{zusatz} ist nicht im Straßenverzeichnis{hinweis}")
+                return
+            strasse = offiziell
+            self.strasse_entry.delete(0, tk.END)
+            self.strasse_entry.insert(0, strasse)
+        
+        entry = {'strasse': strasse, 'hnr': hnr, 'zusatz': zusatz}
+        if entry not in self.history:
+            self.history.append(entry)
+            self.save_history()
+            self.update_history_list()
+        
+        key = TermineCache.key(strasse, hnr, zusatz)
+        self._anfrage_gen += 1
+        gen = self._anfrage_gen
+        with span("cache") as felder:
+            cached = self.cache.get(key) or self.aus_index(strasse, hnr, zusatz)
+            felder['cache'] = ("verfehlt" if cached is None else
+                               "veraltet" if self.cache.is_stale(cached) else "treffer")
+        if cached:
+            # sofort aus dem cache anzeigen, veraltete einträge im hintergrund neu laden
+            stand = datetime.fromtimestamp(cached['fetched']).strftime('%d.%m.%Y %H:%M')
+            if not self.cache.is_stale(cached):
+                self.zeige_termine(cached['termine'], f"✅ {len(cached['termine'])} Termine (Cache, Stand {stand})")
+                return
+            self.zeige_termine(cached['termine'], f"🔄 Stand {stand}, aktualisiere...")
+        else:
+            self.suchen_btn.config(state="disabled")
+            self.status.config(text="⏳ Lade Termine...")
+        
+        def fertig(future):
+            # nur die jüngste anfrage darf die anzeige ändern
+            if gen != self._anfrage_gen or future.cancelled():
+                return
+            try:
+                termine = future.result()
+            except Exception as e:
+                if isinstance(e, VeralteteTermine) and (not cached or cached['fetched'] < e.stand):
+                    # der dienst hat einen neueren, aber ebenfalls veralteten stand
+                    stand_dienst = datetime.fromtimestamp(e.stand).strftime('%d.%m.%Y %H:%M')
+                    self.zeige_termine(e.termine, f"⚠️ Server nicht erreichbar – Stand vom {stand_dienst} (veraltet)")
+                elif cached and isinstance(e, requests.RequestException):
+                    self.status.config(text=f"⚠️ Server nicht erreichbar – Stand vom {stand} (veraltet)")
+                elif cached:
+                    self.status.config(text="⚠️ Aktualisierung fehlgeschlagen, zeige Cache")
+                else:
+                    self.zeige_fehler(e)
+                return
+            self.planer.setze_termine(key, termine)
+            if cached and cached['termine'] == termine:
+                self.status.config(text=f"✅ {len(termine)} Termine (unverändert)")
+                return
+            if cached:
+                aenderungen = beschreibe_aenderungen(diff_termine(cached['termine'], termine))
+                text = "; ".join(aenderungen[:2]) + (f" (+{len(aenderungen) - 2} weitere)" if len(aenderungen) > 2 else "")
+                self.zeige_termine(termine, f"🔄 {len(aenderungen)} Änderungen: {text}")
+                return
+            self.zeige_termine(termine)
+        
+        future = self.abrufen(key, strasse, hnr_int, zusatz)
+        future.add_done_callback(lambda f: self.root.after(0, lambda: fertig(f)))
+    
+    def abrufen(self, key, strasse, hnr, zusatz, vorrang=True):
+        # ein worker für alle abrufe. dieselbe adresse wird nicht doppelt
+        # geholt, noch wartende abrufe anderer adressen sind überholt
+        future = self._laufend.get(key)
+        if future is None:
+            if vorrang:
+                for alt in list(self._laufend.values()):
+                    alt.cancel()
+            future = self.executor.submit(self._hole, key, strasse, hnr, zusatz)
+            self._laufend[key] = future
+            future.add_done_callback(lambda f: self.root.after(0, lambda: self._abruf_beendet(key, f)))
+        self.update_queue()
+        return future
+    
+    def hintergrund_abruf(self, adresse):
+        # aufruf aus dem planer-thread: im tk-thread einreihen, ohne die
+        # anfragen im vordergrund zu verdrängen
+        ergebnis = Future()
+        
+        def weiterreichen(future):
+            if future.cancelled():
+                ergebnis.cancel()
+            elif future.exception() is not None:
+                ergebnis.set_exception(future.exception())
+            else:
+                ergebnis.set_result(future.result())
+        
+        def einreihen():
+            key = TermineCache.key(adresse['strasse'], adresse['hnr'], adresse['zusatz'])
+            try:
+                future = self.abrufen(key, adresse['strasse'], int(adresse['hnr']), adresse['zusatz'], vorrang=False)
+            except ValueError as e:
+                ergebnis.set_exception(e)
+                return
+            future.add_done_callback(weiterreichen)
+        
+        self.root.after(0, einreihen)
+        return ergebnis
+    
+    def erinnern(self, titel, text):
+        desktop_meldung(titel, text)
+        self.root.after(0, lambda: self.status.config(text=f"🔔 {titel}: {text}"))
+    
+    def _hole(self, key, strasse, hnr, zusatz):
+        if isinstance(self.client, ServiceClient):
+            # stand des dienstes übernehmen, damit der cache nicht länger gilt als dort
+            termine, stand, veraltet = self.client.abrufen(strasse, hnr, zusatz)
+            if veraltet:
+                cached = self.cache.get(key)
+                if cached is None or cached['fetched'] < stand:
+                    self.cache.put(key, termine, stand)
+                raise VeralteteTermine(termine, stand)
+            self.cache.put(key, termine, stand)
+            return termine
+        ort = self.index.ort(strasse) if self.index is not None else None
+        termine = self.client.get_termine(strasse, hnr, zusatz, ort=ort)
+        self.cache.put(key, termine)
+        return termine
+    
+    def _abruf_beendet(self, key, future):
+        if self._laufend.get(key) is future:
+            del self._laufend[key]
+        self.update_queue()
+    
+    def update_queue(self):
+        offen = sum(1 for f in self._laufend.values() if not f.done())
+        self.queue_label.config(text=f"⏳ {offen} Abruf{'e' if offen != 1 else ''} offen" if offen else "")
+    
+    def termin_zeilen(self, termine):
+        # (werte, tag) je zeile, inklusive trennzeilen zwischen den tagen.
+        # die abfallart steht schon seit dem parsen am typ-code fest
+        zeilen = []
+        letztes = None
+        for t in termine:
+            if letztes is not None and letztes != t.ordinal:
+                zeilen.append((("", ""), 'separator'))
+            art = t.art
+            zeilen.append(((t.datum, f"{art.icon} {t.typ}"), art.id))
+            letztes = t.ordinal
+        return zeilen
+    
+    def zeige_termine(self, termine, status=None):
+        self.current_termine = termine
+        self._render_gen += 1
+        self._render_fortsetzen = None
+        start = time.perf_counter()
+        
+        # nur den geänderten mittelteil anfassen, gleicher anfang/ende bleibt stehen
+        alt = self._zeilen
+        neu = self.termin_zeilen(termine)
+        n = 0
+        while n < min(len(alt), len(neu)) and alt[n] == neu[n]:
+            n += 1
+        m = 0
+        while m < min(len(alt), len(neu)) - n and alt[-1 - m] == neu[-1 - m]:
+            m += 1
+        
+        self.suchen_btn.config(state="normal")
+        text = status or f"✅ {len(termine)} Termine gefunden"
+        
+        mitte_alt = alt[n:len(alt) - m]
+        mitte_neu = neu[n:len(neu) - m]
+        ops = []
+        if mitte_alt and mitte_neu:
+            # verstreute einzeländerungen (z.b. verschobene termine) gezielt umsetzen
+            ops = [op for op in SequenceMatcher(None, self._diff_keys(mitte_alt), self._diff_keys(mitte_neu),
+                                                autojunk=False).get_opcodes() if op[0] != 'equal']
+        if ops and sum(max(i2 - i1, j2 - j1) for _, i1, i2, j1, j2 in ops) <= 2 * RENDER_CHUNK:
+            for op, i1, i2, j1, j2 in reversed(ops):
+                a, b = n + i1, n + i2
+                if a < b:
+                    self.tree.delete(*self._zeilen_ids[a:b])
+                ids = [self.tree.insert("", a + k, values=werte, tags=(tag,))
+                       for k, (werte, tag) in enumerate(mitte_neu[j1:j2])]
+                self._zeilen[a:b] = mitte_neu[j1:j2]
+                self._zeilen_ids[a:b] = ids
+            dauer = time.perf_counter() - start
+            melde_span("treeview", dauer, zeilen=len(neu), geaendert=len(ops))
+            self.status.config(text=f"{text} · Darstellung {dauer * 1000:.0f} ms")
+            return
+        
+        ende = len(alt) - m  # alt ist self._zeilen, vor dem löschen merken
+        weg = self._zeilen_ids[n:ende]
+        if weg:
+            self.tree.delete(*weg)
+        del self._zeilen[n:ende]
+        del self._zeilen_ids[n:ende]
+        self._render_chunk(self._render_gen, neu[n:len(neu) - m], n, 0,
+                           time.perf_counter() - start, text, lazy=m == 0)
+    
+    @staticmethod
+    def _diff_keys(zeilen):
+        # trennzeilen sind alle gleich, für den vergleich an die folgezeile koppeln
+        return [z if z[1] != 'separator' or i + 1 >= len(zeilen) else (z, zeilen[i + 1][0])
+                for i, z in enumerate(zeilen)]
+    
+    def _render_chunk(self, gen, offen, pos, fertig, dauer, text, lazy):
+        # fügt RENDER_CHUNK zeilen ein und plant den rest per after(),
+        # damit das fenster bei großen listen bedienbar bleibt
+        if gen != self._render_gen:
+            return
+        start = time.perf_counter()
+        chunk = offen[fertig:fertig + RENDER_CHUNK]
+        index = pos + fertig
+        ids = [self.tree.insert("", index + i, values=werte, tags=(tag,))
+               for i, (werte, tag) in enumerate(chunk)]
+        self._zeilen[index:index] = chunk
+        self._zeilen_ids[index:index] = ids
+        fertig += len(chunk)
+        dauer += time.perf_counter() - start
+        
+        if fertig < len(offen):
+            weiter = lambda: self._render_chunk(gen, offen, pos, fertig, dauer, text, lazy)
+            self.status.config(text=f"⏳ {fertig}/{len(offen)} Zeilen dargestellt...")
+            if lazy and self.lazy_render.get() and self.tree.yview()[1] < 1.0:
+                # restliche zeilen erst laden, wenn ans ende gescrollt wird
+                self._render_fortsetzen = weiter
+                self.status.config(text=f"{text} · {fertig}/{len(offen)} Zeilen, Rest beim Scrollen")
+            else:
+                self.root.after(1, weiter)
+            return
+        melde_span("treeview", dauer, zeilen=len(self._zeilen), eingefuegt=len(offen))
+        self.status.config(text=f"{text} · Darstellung {dauer * 1000:.0f} ms")
+    
+    def _tree_scrolled(self, first, last):
+        self.tree_scrollbar.set(first, last)
+        if self._render_fortsetzen and float(last) > 0.9:
+            weiter, self._render_fortsetzen = self._render_fortsetzen, None
+            self.root.after_idle(weiter)
+    
+    def zeige_fehler(self, fehler):
+        # netzwerkprobleme nur in der statuszeile, der nächste versuch kommt von allein
+        if isinstance(fehler, CircuitOpen):
+            self.status.config(text=f"❌ {fehler}")
+        elif isinstance(fehler, requests.RequestException):
+            self.status.config(text=f"❌ Server nicht erreichbar ({type(fehler).__name__})")
+        else:
+            messagebox.showerror("Fehler", f"Fehler beim Abrufen:\n{fehler}")
+            self.status.config(text="❌ Fehler")
+        self.suchen_btn.config(state="normal")
+    
+    def zeige_cache(self):
+        c = self.get_colors()
+        cache_window = tk.Toplevel(self.root)
+        cache_window.title("Cache")
+        cache_window.geometry("500x350")
+        cache_window.configure(bg=c['bg'])
+        
+        tree = ttk.Treeview(cache_window, columns=("adresse", "stand", "anzahl"), show="headings")
+        tree.heading("adresse", text="Adresse")
+        tree.heading("stand", text="Stand")
+        tree.heading("anzahl", text="Termine")
+        tree.column("stand", width=130, anchor='center')
+        tree.column("anzahl", width=70, anchor='center')
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        for key, fetched, anzahl in reversed(self.cache.entries()):
+            strasse, hnr, zusatz = key.split('|')
+            stand = datetime.fromtimestamp(fetched).strftime('%d.%m.%Y %H:%M')
+            tree.insert("", tk.END, values=(f"{strasse.title()} {hnr}{zusatz}", stand, anzahl))
+        
+        btn_frame = tk.Frame(cache_window, bg=c['bg'])
+        btn_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        def leeren():
+            self.cache_leeren()
+            tree.delete(*tree.get_children())
+        
+        tk.Button(btn_frame, text="Cache leeren", command=leeren).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Schließen", command=cache_window.destroy).pack(side=tk.LEFT)
+    
+    def zeige_zeitmessung(self):
+        # p50/p95 der letzten abrufe pro phase, aktualisiert sich solange offen
+        c = self.get_colors()
+        fenster = tk.Toplevel(self.root)
+        fenster.title("Zeitmessung")
+        fenster.geometry("520x330")
+        fenster.configure(bg=c['bg'])
+        
+        spalten = ("phase", "anzahl", "p50", "p95", "letzte")
+        tree = ttk.Treeview(fenster, columns=spalten, show="headings")
+        for spalte, titel in zip(spalten, ("Phase", "Anzahl", "p50 ms", "p95 ms", "Letzte ms")):
+            tree.heading(spalte, text=titel)
+            tree.column(spalte, width=90, anchor='e' if spalte != "phase" else 'w')
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        cache_label = tk.Label(fenster, bg=c['bg'], fg=c['text_secondary'], font=('Segoe UI', 9))
+        cache_label.pack(pady=(0, 10))
+        
+        def aktualisieren():
+            if not fenster.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for phase, anzahl, p50, p95, letzte in self.phasen.zusammenfassung():
+                tree.insert("", tk.END, values=(phase, anzahl, f"{p50:.1f}", f"{p95:.1f}", f"{letzte:.1f}"))
+            cache = self.phasen.cache
+            cache_label.config(text="Cache: " + ", ".join(f"{n}× {art}" for art, n in cache.items())
+                               if cache else "Noch keine Abfragen")
+            fenster.after(1000, aktualisieren)
+        
+        aktualisieren()
+    
+    def cache_leeren(self):
+        self.cache.clear()
+        self.status.config(text="🧹 Cache geleert")
+    
+    def toggle_dark_mode(self):
+        start = time.perf_counter()
+        self.dark_mode = not self.dark_mode
+        self.apply_theme()
+        self.root.update_idletasks()
+        dauer = (time.perf_counter() - start) * 1000
+        self.status.config(text=f"{'🌙 Dark Mode' if self.dark_mode else '☀️ Hell'} ({dauer:.0f} ms)")
+    
+    def drucken(self):
+        if not self.current_termine:
+            messagebox.showinfo("Drucken", "Keine Termine zum Drucken vorhanden")
+            return
+        
+        # druckvorschau fenster
+        print_window = tk.Toplevel(self.root)
+        print_window.title("Druckvorschau")
+        print_window.geometry("600x700")
+        
+        text = scrolledtext.ScrolledText(print_window, font=('Courier', 10), wrap=tk.WORD)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        termine = self.current_termine
+        adresse = f"{self.strasse_entry.get()} {self.hnr_entry.get()}{self.zusatz_entry.get()}"
+        
+        def fuellen(event):
+            # vorschau erst füllen, wenn das fenster wirklich angezeigt wird
+            text.unbind('<Map>')
+            text.insert(tk.END, "\n".join(text_zeilen(termine, adresse)) + "\n")
+            text.config(state=tk.DISABLED)
+        
+        text.bind('<Map>', fuellen)
+        
+        btn_frame = tk.Frame(print_window)
+        btn_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        def speichern(format):
+            # direkt aus den terminen, nicht aus dem textfeld
+            filename = f"abfuhrtermine_{datetime.now().strftime('%Y%m%d')}.{ENDUNGEN[format]}"
+            with oeffne(filename, format) as f:
+                exportiere([(adresse, termine)], format, f, titel=f"Abfuhrtermine {adresse}")
+            messagebox.showinfo("Gespeichert", f"Datei gespeichert als {filename}")
+        
+        for format, label in (("txt", "Als TXT speichern"), ("pdf", "PDF"), ("ical", "iCal"), ("csv", "CSV")):
+            tk.Button(btn_frame, text=label, command=lambda f=format: speichern(f)).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Schließen", command=print_window.destroy).pack(side=tk.LEFT)
+    
+    def zeige_statistik(self):
+        if not self.current_termine:
+            messagebox.showinfo("Statistik", "Keine Termine für Statistik vorhanden")
+            return
+        
+        # statistik fenster
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("Statistik")
+        stats_window.geometry("560x640")
+        
+        c = self.get_colors()
+        stats_window.configure(bg=c['bg'])
+        
+        # header
+        header = tk.Label(stats_window, text="📊 Abfallstatistik", 
+                         font=('Segoe UI', 16, 'bold'),
+                         bg=c['bg'], fg=c['text'])
+        header.pack(pady=20)
+        
+        stat = Statistik([("", self.current_termine)])
+        anzahl_pro_typ = stat.anzahl_pro_typ().items()
+        
+        # frame für statistik
+        stats_frame = tk.Frame(stats_window, bg=c['card'], relief='solid', bd=1)
+        stats_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+        
+        tk.Label(stats_frame, text="Anzahl Termine pro Abfallart:", 
+                font=('Segoe UI', 11, 'bold'),
+                bg=c['card'], fg=c['text']).pack(pady=15)
+        
+        for typ, anzahl in anzahl_pro_typ:
+            item_frame = tk.Frame(stats_frame, bg=c['card'])
+            item_frame.pack(fill=tk.X, padx=20, pady=5)
+            
+            tk.Label(item_frame, text=f"{abfallart(typ).icon} {typ}", font=('Segoe UI', 10),
+                    bg=c['card'], fg=c['text'], anchor='w').pack(side=tk.LEFT, fill=tk.X, expand=True)
+            
+            tk.Label(item_frame, text=f"{anzahl}x", font=('Segoe UI', 10, 'bold'),
+                    bg=c['card'], fg=c['primary']).pack(side=tk.RIGHT)
+        
+        # gesamt
+        total_frame = tk.Frame(stats_frame, bg=c['header'], height=50)
+        total_frame.pack(fill=tk.X, side=tk.BOTTOM, pady=15, padx=20)
+        
+        tk.Label(total_frame, text="Gesamt:", font=('Segoe UI', 11, 'bold'),
+                bg=c['header'], fg=c['text']).pack(side=tk.LEFT, padx=10)
+        
+        tk.Label(total_frame, text=f"{len(self.current_termine)} Termine", 
+                font=('Segoe UI', 11, 'bold'),
+                bg=c['header'], fg=c['primary']).pack(side=tk.RIGHT, padx=10)
+        
+        self.monats_diagramm(stats_frame, stat.pro_monat()).pack(fill=tk.X, padx=20, side=tk.BOTTOM)
+        tk.Button(stats_window, text="Alle Adressen im Cache…", command=self.zeige_gesamtstatistik
+                  ).pack(pady=(0, 15))
+    
+    def monats_diagramm(self, parent, pro_monat, hoehe=160):
+        # gestapelte balken pro monat, direkt aus den aggregaten
+        c = self.get_colors()
+        canvas = tk.Canvas(parent, height=hoehe, bg=c['card'], highlightthickness=0)
+        if not pro_monat:
+            return canvas
+        breite = max(14, 480 // len(pro_monat))
+        canvas.config(scrollregion=(0, 0, breite * len(pro_monat) + 10, hoehe))
+        maximum = max(sum(typen.values()) for typen in pro_monat.values())
+        skala = (hoehe - 30) / maximum
+        for i, ((jahr, monat), typen) in enumerate(pro_monat.items()):
+            x = 5 + i * breite
+            y = hoehe - 18
+            for typ, n in typen.items():
+                art = abfallart(typ)
+                farbe = (art.dunkel if self.dark_mode else art.hell).get('background', c['primary'])
+                canvas.create_rectangle(x + 1, y - n * skala, x + breite - 2, y, fill=farbe, outline=c['border'])
+                y -= n * skala
+            beschriftung = MONATE[monat - 1][0] if breite < 30 else MONATE[monat - 1]
+            canvas.create_text(x + breite // 2, hoehe - 8, text=beschriftung, fill=c['text_secondary'],
+                               font=('Segoe UI', 7))
+        return canvas
+    
+    def zeige_gesamtstatistik(self):
+        stat = aus_cache(self.cache)
+        if not stat.adressen:
+            messagebox.showinfo("Statistik", "Keine Adressen im Cache")
+            return
+        c = self.get_colors()
+        fenster = tk.Toplevel(self.root)
+        fenster.title(f"Statistik: {len(stat.adressen)} Adressen")
+        fenster.geometry("640x640")
+        fenster.configure(bg=c['bg'])
+        self.monats_diagramm(fenster, stat.pro_monat()).pack(fill=tk.X, padx=10, pady=10)
+        text = scrolledtext.ScrolledText(fenster, font=('Courier', 9), wrap=tk.NONE)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        text.insert(tk.END, "\n".join(bericht(stat)))
+        text.config(state=tk.DISABLED)
+
+def main():
+    root = tk.Tk()
+    root.withdraw()
+    
+    # splash nur so lange zeigen, bis das hauptfenster aufgebaut ist
+    splash = SplashScreen(root)
+    app = AbfallApp(root)
+    root.deiconify()
+    root.update_idletasks()
+    splash.close()
+    root.mainloop()
+    app.planer.stop()
+
+if __name__ == "__main__":
+    if TRACE_FILE:
+        add_hook(TraceDatei(TRACE_FILE))
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# straßenverzeichnis der stadt als sqlite-datei, für autovervollständigung
+# und prüfung ohne netzwerk:  python3 bamberg_muell.py index [--termine]
+from html.parser import HTMLParser
+from datetime import date
+from itertools import groupby
+from array import array
+import sqlite3
+import string
+import threading
+import time
+import sys
+import re
+
+from bamberg_muell import API_URL, TermineClient, TerminListe, get_termine_bulk, typ_code
+
+INDEX_FILE = "strassen.db"
+
+# formularaktionen des servlets, die die auswahllisten neu befüllen
+STRASSEN_ACTION = "CITYCHANGED"
+HAUSNUMMERN_ACTION = "STREETCHANGED"
+
+
+class OptionParser(HTMLParser):
+    # sammelt die <option>-werte aller <select>-felder
+    def __init__(self):
+        super().__init__()
+        self.options = {}
+        self._select = None
+
+    def handle_starttag(self, tag, attrs):
+        d = dict(attrs)
+        if tag == "select":
+            self._select = d.get("name")
+            self.options.setdefault(self._select, [])
+        elif tag == "option" and self._select and d.get("value"):
+            self.options[self._select].append(d["value"].strip())
+
+    def handle_endtag(self, tag):
+        if tag == "select":
+            self._select = None
+
+
+def norm(strasse):
+    return " ".join(strasse.casefold().split())
+
+
+def split_hausnummer(text):
+    m = re.match(r"\s*(\d+)\s*(.*)", text)
+    return (m.group(1), m.group(2).strip()) if m else (text.strip(), "")
+
+
+class StrassenIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS strassen (
+                norm TEXT PRIMARY KEY, name TEXT NOT NULL, ort TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS hausnummern (
+                norm TEXT, hnr TEXT, zusatz TEXT, PRIMARY KEY (norm, hnr, zusatz)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS termine (
+                norm TEXT, hnr TEXT, zusatz TEXT, tag INTEGER, typ TEXT);
+            CREATE INDEX IF NOT EXISTS termine_adresse ON termine (norm, hnr, zusatz);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def leer(self):
+        return not self._query("SELECT 1 FROM strassen LIMIT 1")
+
+    def vorschlaege(self, prefix, limit=10):
+        # präfixsuche über den primärschlüssel, ohne tabellenscan
+        p = norm(prefix)
+        rows = self._query("SELECT name FROM strassen WHERE norm >= ? AND norm < ? ORDER BY norm LIMIT ?",
+                           (p, p + "\U0010ffff", limit))
+        return [name for name, in rows]
+
+    def strasse(self, name):
+        # offizielle schreibweise oder None
+        rows = self._query("SELECT name FROM strassen WHERE norm = ?", (norm(name),))
+        return rows[0][0] if rows else None
+
+    def ort(self, name):
+        rows = self._query("SELECT ort FROM strassen WHERE norm = ?", (norm(name),))
+        return rows[0][0] if rows else None
+
+    def hausnummern(self, name):
+        rows = self._query("SELECT hnr, zusatz FROM hausnummern WHERE norm = ?", (norm(name),))
+        return sorted(rows, key=lambda r: (int(r[0]) if r[0].isdigit() else 0, r[1]))
+
+    def adressen(self):
+        # (strasse, hnr, zusatz, ort), ort wie beim crawlen gespeichert
+        return self._query("SELECT s.name, h.hnr, h.zusatz, s.ort FROM strassen s "
+                           "JOIN hausnummern h ON h.norm = s.norm ORDER BY s.norm")
+
+    def kennt(self, name, hnr, zusatz=""):
+        # ohne gecrawlte hausnummern gilt jede nummer einer bekannten straße
+        if not self._query("SELECT 1 FROM hausnummern WHERE norm = ? LIMIT 1", (norm(name),)):
+            return self.strasse(name) is not None
+        return bool(self._query("SELECT 1 FROM hausnummern WHERE norm = ? AND hnr = ? AND zusatz = ?",
+                                (norm(name), str(hnr), zusatz.strip().lower())))
+
+    def termine(self, name, hnr, zusatz=""):
+        rows = self._query("SELECT tag, typ FROM termine WHERE norm = ? AND hnr = ? AND zusatz = ?",
+                           (norm(name), str(hnr), zusatz.strip().lower()))
+        if not rows:
+            return None
+        return TerminListe((date.fromordinal(tag), typ) for tag, typ in rows)
+
+    def alle_termine(self):
+        # (adresse, termine) aller vorberechneten adressen aus einer abfrage
+        rows = self._query("SELECT s.name, t.hnr, t.zusatz, t.tag, t.typ FROM termine t "
+                           "JOIN strassen s ON s.norm = t.norm ORDER BY t.norm, t.hnr, t.zusatz, t.tag, t.typ")
+        for (name, hnr, zusatz), gruppe in groupby(rows, key=lambda r: r[:3]):
+            tage = array('i')
+            codes = array('H')
+            for _, _, _, tag, typ in gruppe:
+                tage.append(tag)
+                codes.append(typ_code(typ))
+            yield f"{name} {hnr}{zusatz}", TerminListe.from_columns(tage, codes)
+    
+    def speichere_strassen(self, ort, strassen):
+        with self._lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO strassen VALUES (?, ?, ?)",
+                                ((norm(s), s, ort) for s in strassen))
+
+    def speichere_hausnummern(self, strasse, nummern):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM hausnummern WHERE norm = ?", (norm(strasse),))
+            self.db.executemany("INSERT OR IGNORE INTO hausnummern VALUES (?, ?, ?)",
+                                ((norm(strasse), hnr, zusatz.lower()) for hnr, zusatz in nummern))
+
+    def speichere_termine(self, strasse, hnr, zusatz, termine):
+        key = (norm(strasse), str(hnr), zusatz.lower())
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM termine WHERE norm = ? AND hnr = ? AND zusatz = ?", key)
+            self.db.executemany("INSERT INTO termine VALUES (?, ?, ?, ?, ?)",
+                                (key + (t.ordinal, t.typ) for t in termine))
+
+    def stand(self, name):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (name,))
+        return float(rows[0][0]) if rows else 0.0
+
+    def setze_stand(self, name):
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, str(time.time())))
+
+    def close(self):
+        self.db.close()
+
+
+def crawl(index, url=API_URL, buchstaben=string.ascii_uppercase, hausnummern=True, log=print):
+    client = TermineClient(url)
+    strassen = []
+    for ort in buchstaben:
+        parser = OptionParser()
+        parser.feed(client.post_form(Ort=ort, Strasse="", SubmitAction=STRASSEN_ACTION))
+        gefunden = parser.options.get("Strasse", [])
+        index.speichere_strassen(ort, gefunden)
+        strassen += [(ort, s) for s in gefunden]
+        log(f"{ort}: {len(gefunden)} Straßen")
+    if hausnummern:
+        for i, (ort, strasse) in enumerate(strassen, 1):
+            parser = OptionParser()
+            parser.feed(client.post_form(Ort=ort, Strasse=strasse, SubmitAction=HAUSNUMMERN_ACTION))
+            nummern = [split_hausnummer(h) for h in parser.options.get("Hausnummer", [])]
+            index.speichere_hausnummern(strasse, nummern)
+            if i % 50 == 0 or i == len(strassen):
+                log(f"Hausnummern: {i}/{len(strassen)} Straßen")
+    client.close()
+    index.setze_stand("strassen")
+    return len(strassen)
+
+
+def precompute(index, url=API_URL, workers=4, per_host=2, log=print):
+    # alle bekannten adressen einmal abrufen, danach reicht ein lokaler lesezugriff
+    adressen = index.adressen()
+    fehler = 0
+    for i, result in enumerate(get_termine_bulk(adressen, workers, per_host, url=url), 1):
+        if result['fehler']:
+            fehler += 1
+        else:
+            index.speichere_termine(result['strasse'], result['hnr'], result['zusatz'], result['termine'])
+        if i % 100 == 0 or i == len(adressen):
+            log(f"Termine: {i}/{len(adressen)} Adressen, {fehler} Fehler")
+    index.setze_stand("termine")
+    return fehler
+
+
+def run_index(args):
+    index = StrassenIndex(args.db)
+    log = lambda text: print(text, file=sys.stderr)
+    try:
+        anzahl = crawl(index, args.url, args.buchstaben.upper(), not args.ohne_hausnummern, log)
+        log(f"{anzahl} Straßen in {args.db}")
+        if args.termine:
+            return 1 if precompute(index, args.url, args.workers, log=log) else 0
+    finally:
+        index.close()
+    return 0
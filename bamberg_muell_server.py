@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# kleiner lokaler dienst, über den sich mehrere rechner einen cache teilen:
+#   python3 bamberg_muell.py serve --port 8080
+#   GET /termine?strasse=Egelseestraße&hnr=114[&zusatz=a][&format=ical]
+#   GET /next?strasse=Egelseestraße&hnr=114[&ab=TT.MM.JJJJ]
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import Future
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, date
+import threading
+import json
+import time
+import requests
+
+from bamberg_muell import API_URL, FormRejected, TermineCache, TermineClient, ical_lines
+
+CLIENTS_MAX = 4  # freie TermineClients, die der dienst offen hält
+
+
+# gleichzeitige anfragen für dieselbe adresse warten auf einen einzigen abruf
+class Coalescer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._laufend = {}
+        self.zusammengefasst = 0
+
+    def run(self, key, func):
+        with self._lock:
+            future = self._laufend.get(key)
+            owner = future is None
+            if owner:
+                future = self._laufend[key] = Future()
+            else:
+                self.zusammengefasst += 1
+        if not owner:
+            return future.result()
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._laufend[key]
+
+
+# höchstens `rate` abrufe pro sekunde bei der stadt
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class TermineService:
+    def __init__(self, cache=None, url=API_URL, rate=1.0):
+        self.cache = cache or TermineCache()
+        self.url = url
+        self.coalescer = Coalescer()
+        self.limiter = RateLimiter(rate)
+        self.upstream = 0
+        self.treffer = 0
+        self.veraltet = 0
+        # freie clients: ThreadingHTTPServer startet pro anfrage einen neuen
+        # thread, session und formular sollen trotzdem wiederverwendet werden
+        self._clients = []
+        self._clients_lock = threading.Lock()
+
+    def _client(self):
+        with self._clients_lock:
+            if self._clients:
+                return self._clients.pop()
+        return TermineClient(self.url)
+
+    def _zurueck(self, client):
+        with self._clients_lock:
+            if len(self._clients) < CLIENTS_MAX:
+                self._clients.append(client)
+                return
+        client.close()
+
+    def close(self):
+        with self._clients_lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
+
+    def termine(self, strasse, hnr, zusatz=""):
+        # (termine, stand, veraltet). antwortet die stadt nicht, gibt es den
+        # abgelaufenen cache-eintrag statt eines fehlers
+        key = TermineCache.key(strasse, hnr, zusatz)
+        cached = self.cache.get(key)
+        if cached and not self.cache.is_stale(cached):
+            self.treffer += 1
+            return cached['termine'], cached['fetched'], False
+
+        def fetch():
+            self.limiter.wait()
+            self.upstream += 1
+            client = self._client()
+            try:
+                termine = client.get_termine(strasse, int(hnr), zusatz)
+            finally:
+                self._zurueck(client)
+            self.cache.put(key, termine)
+            return termine, time.time()
+
+        try:
+            return self.coalescer.run(key, fetch) + (False,)
+        except (requests.RequestException, FormRejected):
+            if not cached:
+                raise
+            self.veraltet += 1
+            return cached['termine'], cached['fetched'], True
+
+    def status(self):
+        return {'cache_treffer': self.treffer, 'upstream_abrufe': self.upstream,
+                'zusammengefasst': self.coalescer.zusammengefasst, 'veraltet_ausgeliefert': self.veraltet,
+                'adressen_im_cache': len(self.cache.entries())}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json; charset=utf-8"):
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        service = self.server.service
+        if url.path == "/status":
+            return self._send(200, service.status())
+        if url.path not in ("/termine", "/next"):
+            return self._send(404, {'fehler': "Unbekannter Pfad"})
+
+        strasse = query.get("strasse", "").strip()
+        hnr = query.get("hnr", "").strip()
+        zusatz = query.get("zusatz", "").strip()
+        if not strasse or not hnr.isdigit():
+            return self._send(400, {'fehler': "strasse und numerische hnr erforderlich"})
+        try:
+            termine, stand, veraltet = service.termine(strasse, hnr, zusatz)
+        except Exception as e:
+            return self._send(502, {'fehler': str(e)})
+
+        adresse = {'strasse': strasse, 'hnr': hnr, 'zusatz': zusatz}
+        stand = datetime.fromtimestamp(stand).isoformat(timespec='seconds')
+        kopf = {'adresse': adresse, 'stand': stand}
+        if veraltet:
+            kopf['veraltet'] = True
+        if url.path == "/next":
+            try:
+                ab = datetime.strptime(query["ab"], '%d.%m.%Y').date() if "ab" in query else date.today()
+            except ValueError:
+                return self._send(400, {'fehler': "ab im Format TT.MM.JJJJ"})
+            naechste = sorted(filter(None, (termine.naechster(typ, ab) for typ in termine.typen())),
+                              key=lambda t: (t.ordinal, t.typ))
+            return self._send(200, {**kopf,
+                                    'naechste': [{'datum': t.date.isoformat(), 'typ': t.typ} for t in naechste]})
+        if query.get("format") == "ical":
+            name = f"Abfuhrtermine {strasse} {hnr}{zusatz}"
+            return self._send(200, "\r\n".join(ical_lines(termine, name)) + "\r\n",
+                              "text/calendar; charset=utf-8")
+        return self._send(200, {**kopf,
+                                'termine': [{'datum': t.date.isoformat(), 'typ': t.typ} for t in termine]})
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host="127.0.0.1", port=8080):
+        super().__init__((host, port), ServiceHandler)
+        self.service = service
+
+
+def serve(args):
+    cache = TermineCache(args.cache) if args.cache else TermineCache()
+    server = ServiceServer(TermineService(cache, args.url, args.rate), args.host, args.port)
+    print(f"Termine-Dienst läuft auf http://{args.host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+    return 0
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# auswertung über alle adressen im cache oder im straßenverzeichnis:
+#   python3 bamberg_muell.py statistik [--index]
+# gerechnet wird auf den ordinal- und typ-spalten der terminlisten. jede
+# kennzahl ist ein durchlauf über ganze arrays (map/Counter in C), datums-
+# objekte entstehen nur einmal pro vorkommendem tag
+from collections import Counter
+from datetime import date
+from itertools import compress
+from operator import add, sub
+import sys
+
+from bamberg_muell import TermineCache, abfallart, typ_name
+
+MONATE = ["Jan", "Feb", "Mär", "Apr", "Mai", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dez"]
+
+
+class Statistik:
+    # adressen mit identischem plan werden nur einmal ausgewertet und mit
+    # ihrer anzahl gewichtet, stadtweit sind das wenige hundert pläne
+    def __init__(self, quellen):
+        # quellen: (adresse, terminliste)-paare
+        self.adressen = []
+        self._plaene = []
+        self._plan_adressen = []
+        plan_nr = {}
+        for adresse, termine in quellen:
+            tage, codes = termine.spalten()
+            schluessel = tage.tobytes() + codes.tobytes()
+            nr = plan_nr.get(schluessel)
+            if nr is None:
+                nr = plan_nr[schluessel] = len(self._plaene)
+                self._plaene.append(termine)
+                self._plan_adressen.append([])
+            self._plan_adressen[nr].append(adresse)
+            self.adressen.append(adresse)
+        self._anzahl = sum(len(t) * len(a) for t, a in zip(self._plaene, self._plan_adressen))
+        tage = set()
+        for termine in self._plaene:
+            tage.update(termine.spalten()[0])
+        # pro vorkommendem tag einmal rechnen: monat als int-schlüssel, wochentag
+        self._monat = {o: (d.year * 12 + d.month - 1) << 16 for o, d in ((o, date.fromordinal(o)) for o in tage)}
+        self._wochentag = {o: (o - 1) % 7 for o in tage}
+        self._pro_monat = None
+        self._intervalle = None
+        self._verschiebungen = None
+
+    def __len__(self):
+        return self._anzahl
+
+    def _gewichtet(self, zaehler, teil, gewicht):
+        if gewicht == 1:
+            zaehler.update(teil)
+        else:
+            for k, n in teil.items():
+                zaehler[k] += n * gewicht
+
+    def anzahl_pro_typ(self):
+        summe = Counter()
+        for typen in self.pro_monat().values():
+            summe.update(typen)
+        return dict(summe.most_common())
+
+    def pro_art(self):
+        # {abfallart: anzahl}, varianten wie "Restmüll 2-wöchentlich" zusammengefasst
+        summe = Counter()
+        for typ, n in self.anzahl_pro_typ().items():
+            summe[abfallart(typ)] += n
+        return dict(summe.most_common())
+
+    def pro_monat(self):
+        # {(jahr, monat): {typ: anzahl}}, gezählt auf (monat << 16) + typ-code
+        if self._pro_monat is None:
+            zaehler = Counter()
+            for termine, adressen in zip(self._plaene, self._plan_adressen):
+                tage, codes = termine.spalten()
+                self._gewichtet(zaehler, Counter(map(add, map(self._monat.__getitem__, tage), codes)), len(adressen))
+            self._pro_monat = {}
+            for schluessel, n in sorted(zaehler.items()):
+                jahr, monat = divmod(schluessel >> 16, 12)
+                self._pro_monat.setdefault((jahr, monat + 1), {})[typ_name(schluessel & 0xFFFF)] = n
+        return self._pro_monat
+
+    def pro_jahr(self):
+        # {jahr: {typ: anzahl}}, aus pro_monat verdichtet
+        jahre = {}
+        for (jahr, _), typen in self.pro_monat().items():
+            summe = jahre.setdefault(jahr, {})
+            for typ, n in typen.items():
+                summe[typ] = summe.get(typ, 0) + n
+        return jahre
+
+    def _reihen(self):
+        # (typ, ordinals, gewicht) je plan und abfallart, schon sortiert
+        for termine, adressen in zip(self._plaene, self._plan_adressen):
+            for typ in termine.typen():
+                yield typ, termine.tage(typ), len(adressen)
+
+    def intervalle(self):
+        # {typ: Counter(abstand in tagen)} zwischen aufeinanderfolgenden abholungen
+        if self._intervalle is None:
+            self._intervalle = {}
+            for typ, tage, gewicht in self._reihen():
+                self._gewichtet(self._intervalle.setdefault(typ, Counter()),
+                                Counter(map(sub, tage[1:], tage[:-1])), gewicht)
+        return self._intervalle
+
+    def verschiebungen(self):
+        # abholungen abseits des üblichen wochentags ihrer reihe, meist wegen
+        # feiertagen. {(regulärer tag, verschiebung in tagen): anzahl}
+        if self._verschiebungen is None:
+            zaehler = Counter()
+            for _, tage, gewicht in self._reihen():
+                wochentage = list(map(self._wochentag.__getitem__, tage))
+                haeufig = Counter(wochentage).most_common(2)
+                if len(haeufig) < 2:
+                    continue
+                ueblich = haeufig[0][0]
+                for ordinal, wt in compress(zip(tage, wochentage), map(ueblich.__ne__, wochentage)):
+                    versatz = (wt - ueblich + 3) % 7 - 3
+                    zaehler[(ordinal - versatz, versatz)] += gewicht
+            self._verschiebungen = dict(sorted(zaehler.items()))
+        return self._verschiebungen
+
+    def gleiche_plaene(self, mindestens=2):
+        # adressen mit identischem plan, größte gruppen zuerst
+        return sorted((a for a in self._plan_adressen if len(a) >= mindestens), key=len, reverse=True)
+
+
+def aus_cache(cache):
+    return Statistik((key_name(key), termine) for key, termine in cache.alle())
+
+
+def key_name(key):
+    strasse, hnr, zusatz = key.split('|')
+    return f"{strasse.title()} {hnr}{zusatz}"
+
+
+def bericht(stat, gruppen=10):
+    # textzusammenfassung, wie sie der statistik-befehl ausgibt
+    zeilen = [f"{len(stat.adressen)} Adressen, {len(stat)} Termine",
+              "  " + ", ".join(f"{art.icon} {art.name} {n}" for art, n in stat.pro_art().items()), ""]
+    typen = list(stat.anzahl_pro_typ())
+    zeilen.append("Abholungen pro Jahr:")
+    for jahr, anzahl in stat.pro_jahr().items():
+        zeilen.append(f"  {jahr}: " + ", ".join(f"{typ} {anzahl[typ]}" for typ in typen if typ in anzahl))
+    zeilen += ["", "Abholungen pro Monat:", "  " + " " * 8 + "".join(f"{typ[:12]:>13}" for typ in typen)]
+    for (jahr, monat), anzahl in stat.pro_monat().items():
+        zeilen.append(f"  {MONATE[monat - 1]} {jahr}" + "".join(f"{anzahl.get(typ, 0):13}" for typ in typen))
+    zeilen += ["", "Abstände zwischen Abholungen:"]
+    for typ, abstaende in stat.intervalle().items():
+        haeufig = ", ".join(f"{tage} Tage ({n}×)" for tage, n in abstaende.most_common(3))
+        zeilen.append(f"  {typ}: {haeufig}")
+    zeilen += ["", "Verschiebungen (meist Feiertage):"]
+    verschiebungen = stat.verschiebungen()
+    for (ordinal, versatz), n in verschiebungen.items():
+        tag = date.fromordinal(ordinal)
+        zeilen.append(f"  {tag.strftime('%d.%m.%Y')}: {n} Abholungen um {versatz:+d} Tag(e)")
+    if not verschiebungen:
+        zeilen.append("  keine")
+    plaene = stat.gleiche_plaene()
+    zeilen += ["", f"Adressen mit identischem Plan: {len(plaene)} Gruppen"]
+    for gruppe in plaene[:gruppen]:
+        zeilen.append(f"  {len(gruppe)} Adressen: " + ", ".join(gruppe[:5]) + (" …" if len(gruppe) > 5 else ""))
+    return zeilen
+
+
+def run_statistik(args):
+    if args.index:
+        from bamberg_muell_index import INDEX_FILE, StrassenIndex
+        index = StrassenIndex(args.db or INDEX_FILE)
+        try:
+            stat = Statistik(index.alle_termine())
+        finally:
+            index.close()
+    else:
+        stat = aus_cache(TermineCache(args.cache) if args.cache else TermineCache())
+    if not stat.adressen:
+        print("Keine Termine vorhanden", file=sys.stderr)
+        return 1
+    print("\n".join(bericht(stat, args.gruppen)))
+    return 0
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# messungen gegen das lokale fake-servlet:  python3 benchmark.py <name> [optionen]
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from fake_servlet import FakeServlet, make_ical, FORM_HTML, TYPEN
+import bamberg_muell
+
+
+def bench_client(args):
+    # einzelne get_termine-aufrufe gegen einen wiederverwendeten TermineClient
+    server = FakeServlet(events=args.events, latency=args.latency,
+                         max_session_uses=args.session_uses).start()
+    adressen = [(f"Teststraße {i % 37}", i + 1, "") for i in range(args.lookups)]
+    try:
+        start_requests = server.requests
+        start = time.perf_counter()
+        for strasse, hnr, zusatz in adressen:
+            bamberg_muell.get_termine(strasse, hnr, zusatz, url=server.url)
+        einzeln = time.perf_counter() - start
+        einzeln_requests = server.requests - start_requests
+
+        client = bamberg_muell.TermineClient(server.url)
+        start_requests = server.requests
+        start = time.perf_counter()
+        for strasse, hnr, zusatz in adressen:
+            client.get_termine(strasse, hnr, zusatz)
+        gepoolt = time.perf_counter() - start
+        gepoolt_requests = server.requests - start_requests
+        client.close()
+    finally:
+        server.shutdown()
+
+    n = len(adressen)
+    print(f"{n} Abfragen, Latenz {args.latency * 1000:.0f} ms pro Request")
+    print(f"get_termine:   {einzeln_requests / n:.2f} Requests/Abfrage, {einzeln / n * 1000:.1f} ms/Abfrage")
+    print(f"TermineClient: {gepoolt_requests / n:.2f} Requests/Abfrage, {gepoolt / n * 1000:.1f} ms/Abfrage")
+
+
+def parse_split(text):
+    # der frühere parser aus get_termine, als vergleich
+    termine = []
+    current_date = None
+    current_date_sort = None
+    for line in text.split('\n'):
+        if line.startswith('DTSTART'):
+            date = line.split(':')[1]
+            current_date = f"{date[6:8]}.{date[4:6]}.{date[0:4]}"
+            current_date_sort = date
+        elif line.startswith('SUMMARY') and current_date:
+            desc = line.split(':')[1].strip()
+            termine.append((current_date_sort, current_date, desc))
+            current_date = None
+            current_date_sort = None
+    termine.sort(key=lambda x: (x[0], x[2]))
+    return [(datum, typ) for _, datum, typ in termine]
+
+
+def _measure(func):
+    # zeit und speicher getrennt messen, tracemalloc bremst stark
+    start = time.perf_counter()
+    result = func()
+    dauer = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, dauer, peak
+
+
+def bench_ical(args):
+    raw = make_ical(args.events).encode("utf-8")
+    chunks = [raw[i:i + 8192] for i in range(0, len(raw), 8192)]
+    print(f"{args.events} Events, {len(raw) / 1024:.0f} KiB")
+
+    # nur parsen, ohne ergebnisliste: zeigt den speicher pro event
+    def zaehlen():
+        return sum(1 for _ in bamberg_muell.iter_ical_events(iter(chunks)))
+
+    _, dauer, peak = _measure(lambda: parse_split(raw.decode("utf-8")))
+    print(f"split('\\n'):       {dauer * 1000:8.1f} ms, Peak {peak / 1024:8.0f} KiB")
+    _, dauer, peak = _measure(lambda: bamberg_muell.sort_termine(bamberg_muell.iter_ical_events(iter(chunks))))
+    print(f"iter_ical_events:  {dauer * 1000:8.1f} ms, Peak {peak / 1024:8.0f} KiB")
+    _, dauer, peak = _measure(zaehlen)
+    print(f"  nur streamen:    {dauer * 1000:8.1f} ms, Peak {peak / 1024:8.0f} KiB")
+
+
+def bench_theme(args):
+    # braucht ein display. vergleicht den früheren neuaufbau der oberfläche
+    # mit apply_theme bei args.events geladenen terminen
+    import tkinter as tk
+    from datetime import date, timedelta
+
+    import bamberg_muell_gui
+
+    bamberg_muell_gui.RENDER_CHUNK = 10 ** 9  # synchron rendern, ohne mainloop
+    root = tk.Tk()
+    app = bamberg_muell_gui.AbfallApp(root)
+    app.zeige_termine(bamberg_muell.TerminListe(
+        (date(2025, 1, 1) + timedelta(days=i // 4), TYPEN[i % len(TYPEN)]) for i in range(args.events)))
+    root.update()
+
+    def neuaufbau():
+        app.dark_mode = not app.dark_mode
+        for widget in root.winfo_children():
+            if not isinstance(widget, tk.Menu):
+                widget.destroy()
+        app.build_ui()
+        app.zeige_termine(app.current_termine)
+        root.update_idletasks()
+
+    def umfaerben():
+        app.dark_mode = not app.dark_mode
+        app.apply_theme()
+        root.update_idletasks()
+
+    print(f"{args.events} Termine geladen")
+    for name, func in (("Neuaufbau (vorher)", neuaufbau), ("apply_theme", umfaerben)):
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            func()
+        print(f"{name:20} {(time.perf_counter() - start) / args.lookups * 1000:8.1f} ms pro Umschaltung")
+    root.destroy()
+
+
+def _python_zeit(args, wiederholungen):
+    start = time.perf_counter()
+    for _ in range(wiederholungen):
+        subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return (time.perf_counter() - start) / wiederholungen
+
+
+def bench_startup(args):
+    # importzeit der bibliothek und zeit bis zum ersten ergebnis bei cache-treffer
+    n = args.lookups
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = bamberg_muell.TermineCache(os.path.join(tmp, "termine.snap"))
+        termine = bamberg_muell.parse_ical(make_ical(args.events))
+        cache.put(cache.key("Egelseestraße", 114), termine)
+
+        leer = _python_zeit(["-c", "pass"], n)
+        print(f"python -c pass:         {leer * 1000:6.0f} ms")
+        t = _python_zeit(["-c", "import bamberg_muell, sys; assert 'tkinter' not in sys.modules"], n)
+        print(f"import bamberg_muell:   {t * 1000:6.0f} ms (ohne tkinter)")
+        t = _python_zeit(["-c", "import bamberg_muell_gui"], n)
+        print(f"import bamberg_muell_gui: {t * 1000:4.0f} ms")
+        t = _python_zeit(["bamberg_muell.py", "--cache", cache.path, "next", "Egelseestraße", "114", "--ab", "01.01.2025"], n)
+        print(f"next (Cache-Treffer):   {t * 1000:6.0f} ms")
+
+
+class _Widget:
+    # schluckt config() & co. der widgets, die zeige_termine anfasst
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class _Tree(_Widget):
+    # treeview-ersatz mit derselben einfüge-/löschsemantik, ohne display
+    def __init__(self):
+        self.zeilen = []
+        self.werte = {}
+        self._nr = 0
+
+    def insert(self, parent, index, values, tags):
+        self._nr += 1
+        self.zeilen.insert(len(self.zeilen) if index == "end" else index, self._nr)
+        self.werte[self._nr] = values
+        return self._nr
+
+    def delete(self, *ids):
+        weg = set(ids)
+        self.zeilen = [i for i in self.zeilen if i not in weg]
+
+    def get_children(self):
+        return list(self.zeilen)
+
+    def yview(self):
+        return (0.0, 1.0)
+
+
+class _Root(_Widget):
+    def after(self, ms, func=None, *args):
+        if func:
+            func(*args)
+
+    after_idle = after
+
+
+def headless_app():
+    # AbfallApp ohne tk.Tk(): nur der zustand, den zeige_termine braucht
+    import bamberg_muell_gui
+    app = bamberg_muell_gui.AbfallApp.__new__(bamberg_muell_gui.AbfallApp)
+    app.root, app.tree = _Root(), _Tree()
+    app.status = app.suchen_btn = _Widget()
+    app.lazy_render = _Widget()
+    app._zeilen, app._zeilen_ids = [], []
+    app._render_gen, app._render_fortsetzen = 0, None
+    return app
+
+
+def _zeit(func, wiederholungen, streuung=None, name=None):
+    # minimum in ms ohne garbage collection (wie timeit): ausreißer durch
+    # andere prozesse machen einen lauf nur langsamer, nie schneller.
+    # median minus minimum landet als rauschmaß in `streuung`
+    werte = []
+    gc_an = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(wiederholungen):
+            start = time.perf_counter()
+            func()
+            werte.append((time.perf_counter() - start) * 1000)
+    finally:
+        if gc_an:
+            gc.enable()
+    if streuung is not None:
+        streuung[name] = statistics.median(werte) - min(werte)
+    return min(werte)
+
+
+def suite_messungen(args):
+    import bamberg_muell_export
+    import bamberg_muell_statistik
+    n = args.wiederholungen
+    ergebnis = {}
+    streuung = {}
+
+    def messe(name, func, wiederholungen=n, teiler=1):
+        ergebnis[name] = _zeit(func, wiederholungen, streuung, name) / teiler
+        streuung[name] /= teiler
+
+    raw = make_ical(args.events).encode("utf-8")
+    chunks = [raw[i:i + 8192] for i in range(0, len(raw), 8192)]
+
+    def formular():
+        parser = bamberg_muell.HiddenInputParser()
+        parser.feed(FORM_HTML.format(session="S00000001"))
+        return parser.args
+
+    messe('formular_ms', formular, n * 10)
+    events = list(bamberg_muell.iter_ical_events(iter(chunks)))
+    messe('ical_parse_ms', lambda: list(bamberg_muell.iter_ical_events(iter(chunks))))
+    messe('sortieren_ms', lambda: bamberg_muell.sort_termine(events))
+    termine = bamberg_muell.sort_termine(events)
+
+    server = FakeServlet(events=args.events, latency=args.latency).start()
+    try:
+        client = bamberg_muell.TermineClient(server.url)
+        client.get_termine("Teststraße", 1)
+        messe('abruf_ms', lambda: client.get_termine("Teststraße", 1))
+        client.close()
+    finally:
+        server.shutdown()
+
+    def darstellen():
+        app = headless_app()
+        app.zeige_termine(termine)
+
+    messe('darstellung_ms', darstellen)
+    # aktualisierung mit zwei verschobenen terminen
+    zeilen = [(t.date, t.typ) for t in termine]
+    for i in (len(zeilen) // 5, len(zeilen) * 4 // 5):
+        zeilen[i] = (zeilen[i][0] + timedelta(days=1), zeilen[i][1])
+    geaendert = bamberg_muell.TerminListe(zeilen)
+    app = headless_app()
+
+    def aktualisieren():
+        app.zeige_termine(termine)
+        app.zeige_termine(geaendert)
+
+    app.zeige_termine(geaendert)
+    messe('aktualisierung_ms', aktualisieren, teiler=2)
+    messe('drucken_ms', lambda: "\n".join(bamberg_muell_export.text_zeilen(termine, "Teststraße 1")))
+    messe('statistik_ms', lambda: bamberg_muell_statistik.Statistik([("", termine)]).pro_monat())
+    return ergebnis, streuung
+
+
+def bench_suite(args):
+    # alle messungen gegen eine json-baseline. mit --speichern wird sie
+    # (neu) geschrieben, sonst scheitert der lauf bei einer regression
+    ergebnis, streuung = suite_messungen(args)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if baseline and baseline.get('events') != args.events:
+        print(f"Baseline mit {baseline.get('events')} Events, Messung mit {args.events}", file=sys.stderr)
+        baseline = {}
+    werte = baseline.get('messungen', {})
+    streuung_alt = baseline.get('streuung', {})
+
+    regressionen = []
+    print(f"{args.events} Events, Minimum aus {args.wiederholungen} Läufen")
+    for name, ms in ergebnis.items():
+        alt = werte.get(name)
+        if alt is None:
+            print(f"{name:20} {ms:9.3f} ms")
+            continue
+        faktor = ms / alt if alt else 1.0
+        markierung = ""
+        # erlaubt ist die toleranz plus das rauschen beider messungen
+        rauschen = max(args.min_ms, streuung.get(name, 0.0), streuung_alt.get(name, 0.0))
+        if ms > alt * (1 + args.toleranz) + rauschen:
+            regressionen.append(name)
+            markierung = "  <-- REGRESSION"
+        print(f"{name:20} {ms:9.3f} ms  (Baseline {alt:9.3f} ms, {faktor:5.2f}x){markierung}")
+
+    if args.speichern:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({'events': args.events, 'python': sys.version.split()[0],
+                       'messungen': ergebnis, 'streuung': streuung}, f, indent=1)
+            f.write("\n")
+        print(f"Baseline gespeichert: {args.baseline}")
+        return 0
+    if regressionen:
+        print(f"{len(regressionen)} Regression(en): {', '.join(regressionen)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def bench_fehler(args):
+    # gestörtes servlet: erfolgsquote mit wiederholungen, schnelles scheitern
+    # bei offenem circuit breaker, alter cache-stand statt fehlermeldung
+    server = FakeServlet(events=args.events, latency=args.latency, fehlerquote=args.fehlerquote,
+                         haenger=args.haenger, haenger_dauer=args.haenger_dauer, seed=1).start()
+    client = bamberg_muell.TermineClient(server.url, timeout=(1.0, args.haenger_dauer / 2))
+    try:
+        dauer = []
+        ok = 0
+        for i in range(args.lookups):
+            start = time.perf_counter()
+            try:
+                client.get_termine(f"Teststraße {i % 37}", i + 1)
+                ok += 1
+            except Exception:
+                pass
+            dauer.append(time.perf_counter() - start)
+        print(f"{args.lookups} Abfragen, {args.fehlerquote:.0%} Fehler, {args.haenger:.0%} Hänger "
+              f"({server.fehler} Störungen bei {server.requests} Requests)")
+        print(f"erfolgreich:   {ok}/{args.lookups}, median {statistics.median(dauer) * 1000:.0f} ms, "
+              f"max {max(dauer) * 1000:.0f} ms/Abfrage")
+
+        server.ausfall = True
+        requests_vorher = server.requests
+        versuche = []
+        for i in range(bamberg_muell.BREAKER_FEHLER + 5):
+            start = time.perf_counter()
+            try:
+                client.get_termine("Teststraße 1", 1)
+            except Exception as e:
+                versuche.append((type(e).__name__, time.perf_counter() - start))
+        offen = [d for name, d in versuche if name == "CircuitOpen"]
+        print(f"Ausfall:       {len(versuche)} Abfragen, {server.requests - requests_vorher} Requests, "
+              f"{len(offen)} vom Circuit Breaker abgewiesen, median {statistics.median(offen or [0]) * 1000:.2f} ms")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = bamberg_muell.TermineCache(os.path.join(tmp, "termine.snap"))
+            termine = bamberg_muell.parse_ical(make_ical(args.events))
+            cache.put(bamberg_muell.TermineCache.key("Teststraße", 1, ""), termine, time.time() - 2 * cache.ttl)
+            start = time.perf_counter()
+            termine, stand, quelle = bamberg_muell.lade_termine("Teststraße", 1, "", cache, server.url)
+            print(f"veralteter Cache: quelle={quelle}, {len(termine)} Termine in "
+                  f"{(time.perf_counter() - start) * 1000:.2f} ms")
+    finally:
+        client.close()
+        server.shutdown()
+    return 0
+
+
+BENCHMARKS = {
+    "client": bench_client,
+    "fehler": bench_fehler,
+    "ical": bench_ical,
+    "startup": bench_startup,
+    "suite": bench_suite,
+    "theme": bench_theme,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks gegen das Fake-Servlet")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--lookups", type=int, default=50)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02, help="Sekunden pro Request")
+    parser.add_argument("--session-uses", type=int, default=None,
+                        help="Fake-Servlet verwirft Sessions nach so vielen Downloads")
+    parser.add_argument("--fehlerquote", type=float, default=0.2, help="fehler: Anteil der HTTP-500-Antworten")
+    parser.add_argument("--haenger", type=float, default=0.02, help="fehler: Anteil der Anfragen ohne Antwort")
+    parser.add_argument("--haenger-dauer", type=float, default=4.0, help="fehler: Sekunden pro Hänger")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="nur suite")
+    parser.add_argument("--speichern", action="store_true", help="suite: Baseline neu schreiben")
+    parser.add_argument("--toleranz", type=float, default=0.5, help="suite: erlaubte Verlangsamung (0.5 = 50%%)")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="suite: kleinere Abweichungen ignorieren")
+    parser.add_argument("--wiederholungen", type=int, default=20, help="suite: Läufe pro Messung")
+    args = parser.parse_args()
+    sys.exit(BENCHMARKS[args.name](args))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# lokaler nachbau des WasteManagementServlet der stadt bamberg, zum testen
+# von get_termine ohne netzwerk:  python3 fake_servlet.py [port]
+# mit --fehlerquote/--haenger antwortet er zufällig mit 500 oder gar nicht
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+from datetime import date, timedelta
+import argparse
+import random
+import threading
+import time
+import sys
+
+TYPEN = ["Restmüll", "Biomüll", "Papiertonne", "Gelber Sack"]
+
+STRASSEN = ["Am Kranen", "Austraße", "Egelseestraße", "Franz-Ludwig-Straße", "Grüner Markt",
+            "Hauptsmoorstraße", "Kapuzinerstraße", "Lange Straße", "Luitpoldstraße",
+            "Obere Königstraße", "Schillerplatz", "Untere Brücke"]
+
+FORM_HTML = """<html><body><form method="post">
+<input type="hidden" name="SessionId" value="{session}">
+<input type="hidden" name="ApplicationName" value="com.athos.kd.bamberg.AbfuhrTerminModel">
+<input type="hidden" name="SubmitAction" value="wasteDisposalServices">
+<input type="text" name="Strasse" value="">
+</form></body></html>"""
+
+
+def select_html(name, werte):
+    options = "".join(f'<option value="{w}">{w}</option>' for w in werte)
+    return f'<html><body><select name="{name}"><option value="">--</option>{options}</select></body></html>'
+
+
+def make_ical(events=100, start=date(2025, 1, 2), seed=""):
+    # deterministische termine je adresse, damit sich caches vergleichen lassen
+    offset = sum(map(ord, seed)) % 7
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//fake//Bamberg//DE"]
+    for i in range(events):
+        tag = start + timedelta(days=offset + (i // len(TYPEN)) * 7 + i % 2)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{seed}-{i}@fake",
+            f"DTSTART;VALUE=DATE:{tag.strftime('%Y%m%d')}",
+            f"SUMMARY:{TYPEN[i % len(TYPEN)]}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+class FakeServlet(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, events=100, latency=0.0, max_session_uses=None,
+                 fehlerquote=0.0, haenger=0.0, haenger_dauer=30.0, seed=None):
+        super().__init__(("127.0.0.1", port), FakeServletHandler)
+        self.events = events
+        self.latency = latency
+        # fehlerinjektion: anteil der anfragen mit 500, anteil ohne antwort
+        # für haenger_dauer sekunden, ausfall=True beantwortet alles mit 503
+        self.fehlerquote = fehlerquote
+        self.haenger = haenger
+        self.haenger_dauer = haenger_dauer
+        self.ausfall = False
+        self.fehler = 0
+        self._random = random.Random(seed)
+        # nach so vielen downloads verwirft der server die session (wie ein timeout)
+        self.max_session_uses = max_session_uses
+        self._session_uses = {}
+        self.requests = 0
+        self.downloads = 0
+        self._lock = threading.Lock()
+        self._sessions = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/WasteManagementServlet"
+
+    def count(self, download=False):
+        with self._lock:
+            self.requests += 1
+            if download:
+                self.downloads += 1
+
+    def stoerung(self):
+        # None, 503, 500 oder "haenger" für die nächste anfrage
+        with self._lock:
+            if self.ausfall:
+                stoerung = 503
+            else:
+                zufall = self._random.random()
+                stoerung = (500 if zufall < self.fehlerquote else
+                            "haenger" if zufall < self.fehlerquote + self.haenger else None)
+            if stoerung is not None:
+                self.fehler += 1
+            return stoerung
+
+    def use_session(self, session):
+        with self._lock:
+            uses = self._session_uses.get(session, 0) + 1
+            self._session_uses[session] = uses
+            return self.max_session_uses is None or uses <= self.max_session_uses
+
+    def new_session(self):
+        with self._lock:
+            self._sessions += 1
+            return f"S{self._sessions:08d}"
+
+    def handle_error(self, request, client_address):
+        # nach einem hänger hat der client die verbindung längst aufgegeben
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeServletHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type="text/html; charset=utf-8", status=200):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _gestoert(self):
+        stoerung = self.server.stoerung()
+        if stoerung == "haenger":
+            time.sleep(self.server.haenger_dauer)
+            self.close_connection = True
+            return True
+        if stoerung is not None:
+            self._send("<html><body>Service Unavailable</body></html>", status=stoerung)
+            return True
+        return False
+
+    def do_GET(self):
+        self.server.count()
+        if self._gestoert():
+            return
+        self._send(FORM_HTML.format(session=self.server.new_session()))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        args = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        action = args.get("SubmitAction")
+        self.server.count(download=action == "filedownload_ICAL")
+        if self._gestoert():
+            return
+        if action == "filedownload_ICAL" and not self.server.use_session(args.get("SessionId")):
+            self._send(FORM_HTML.format(session=self.server.new_session()))
+        elif action == "filedownload_ICAL":
+            seed = f"{args.get('Strasse', '')}{args.get('Hausnummer', '')}{args.get('Hausnummerzusatz', '')}"
+            self._send(make_ical(self.server.events, seed=seed), "text/calendar; charset=utf-8")
+        elif action == "CITYCHANGED" and not args.get("Strasse"):
+            ort = args.get("Ort", "")
+            self._send(select_html("Strasse", [s for s in STRASSEN if s.startswith(ort)]))
+        elif action == "STREETCHANGED":
+            self._send(select_html("Hausnummer", [str(n) for n in range(1, 21)] + ["3a", "3b"]))
+        else:
+            self._send(FORM_HTML.format(session=args.get("SessionId", "")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake WasteManagementServlet")
+    parser.add_argument("port", type=int, nargs="?", default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Sekunden pro Antwort")
+    parser.add_argument("--fehlerquote", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 500")
+    parser.add_argument("--haenger", type=float, default=0.0, help="Anteil der Anfragen ohne Antwort")
+    parser.add_argument("--haenger-dauer", type=float, default=30.0)
+    args = parser.parse_args()
+    server = FakeServlet(args.port, latency=args.latency, fehlerquote=args.fehlerquote,
+                         haenger=args.haenger, haenger_dauer=args.haenger_dauer)
+    print(f"Fake-Servlet läuft auf {server.url}")
+    server.serve_forever()
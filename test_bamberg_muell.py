@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# tests ohne netzwerk, gegen das lokale fake-servlet:  python -m pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import argparse
+import io
+import threading
+import time
+
+import pytest
+import requests
+
+import bamberg_muell
+import bamberg_muell_erinnerung
+from bamberg_muell import (CircuitBreaker, CircuitOpen, Snapshot, TermineCache, TermineClient,
+                           TerminListe, diff_termine, iter_ical_events, lade_termine)
+from bamberg_muell_export import exportiere
+from bamberg_muell_server import Coalescer, TermineService
+from benchmark import headless_app
+from fake_servlet import FakeServlet
+
+
+def ical(*events):
+    return "\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", *events, "END:VCALENDAR"]) + "\r\n"
+
+
+def tage(events):
+    return [(e['datum'].isoformat(), e['typ']) for e in events]
+
+
+@pytest.fixture
+def servlet():
+    server = FakeServlet(events=20).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def ohne_backoff(monkeypatch):
+    monkeypatch.setattr(bamberg_muell, "_backoff", lambda versuch, basis=0: 0)
+
+
+# iCal
+
+def test_ical_gefaltete_zeilen_und_parameter():
+    text = ical("BEGIN:VEVENT", "DTSTART;TZID=\"Europe/Berlin:X\";VALUE=DATE:20250106",
+                "SUMMARY;LANGUAGE=de:Rest", " müll\\, grau", "END:VEVENT")
+    assert tage(iter_ical_events([text])) == [("2025-01-06", "Restmüll, grau")]
+
+
+def test_ical_stueckweise_mit_geteilten_utf8_zeichen():
+    raw = ical("BEGIN:VEVENT", "DTSTART:20250106T070000Z", "SUMMARY:Biomüll", "END:VEVENT").encode("utf-8")
+    chunks = [raw[i:i + 3] for i in range(0, len(raw), 3)]
+    assert tage(iter_ical_events(chunks)) == [("2025-01-06", "Biomüll")]
+
+
+def test_ical_rrule_mit_exdate():
+    text = ical("BEGIN:VEVENT", "DTSTART;VALUE=DATE:20250106", "RRULE:FREQ=WEEKLY;INTERVAL=2;COUNT=4",
+                "EXDATE;VALUE=DATE:20250120", "EXDATE;VALUE=DATE:20250203", "SUMMARY:Papier", "END:VEVENT")
+    assert [d for d, _ in tage(iter_ical_events([text]))] == ["2025-01-06", "2025-02-17"]
+
+
+def test_ical_rrule_byday():
+    text = ical("BEGIN:VEVENT", "DTSTART;VALUE=DATE:20250106", "RRULE:FREQ=WEEKLY;BYDAY=MO,TH;COUNT=4",
+                "SUMMARY:Gelber Sack", "END:VEVENT", "BEGIN:VEVENT", "DTSTART;VALUE=DATE:20250107",
+                "RRULE:FREQ=MONTHLY;BYDAY=1TU;COUNT=3", "SUMMARY:Problemmüll", "END:VEVENT")
+    assert [d for d, _ in tage(iter_ical_events([text]))] == [
+        "2025-01-06", "2025-01-09", "2025-01-13", "2025-01-16", "2025-01-07", "2025-02-04", "2025-03-04"]
+
+
+def test_ical_unbekannte_rrule_nur_erster_termin(capsys):
+    text = ical("BEGIN:VEVENT", "DTSTART;VALUE=DATE:20250106",
+                "RRULE:FREQ=MONTHLY;BYDAY=MO;BYSETPOS=1;COUNT=3", "SUMMARY:Bio", "END:VEVENT")
+    assert tage(iter_ical_events([text])) == [("2025-01-06", "Bio")]
+    assert "RRULE" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("start, rrule, anzahl", [
+    ("20250106", "FREQ=YEARLY;COUNT=5", 5),
+    ("20250106", "FREQ=WEEKLY;COUNT=200", 200),
+    ("20240229", "FREQ=YEARLY;COUNT=2", 2),
+    ("20250106", "FREQ=WEEKLY", 105),
+])
+def test_ical_rrule_count_ohne_horizont(start, rrule, anzahl):
+    text = ical("BEGIN:VEVENT", f"DTSTART;VALUE=DATE:{start}", f"RRULE:{rrule}", "SUMMARY:Bio", "END:VEVENT")
+    assert len(list(iter_ical_events([text]))) == anzahl
+
+
+@pytest.mark.parametrize("interval", ["0", "-2"])
+def test_ical_rrule_interval_unter_eins(interval, capsys):
+    text = ical("BEGIN:VEVENT", "DTSTART;VALUE=DATE:20250106", f"RRULE:FREQ=DAILY;INTERVAL={interval}",
+                "SUMMARY:Bio", "END:VEVENT")
+    assert tage(iter_ical_events([text])) == [("2025-01-06", "Bio")]
+    assert "RRULE" in capsys.readouterr().err
+
+
+def test_ical_kein_kalender():
+    with pytest.raises(bamberg_muell.KeinKalender):
+        list(iter_ical_events(["<html><body>Formular</body></html>"]))
+
+
+def test_ical_export_faltet_lange_zeilen():
+    adresse = "Obere Königstraße 123a, Bamberg – Hinterhaus über dem Hof"
+    termine = liste(("2025-01-06", "Restmüll 14-täglich, graue Tonne mit Übergröße für Großwohnanlagen"))
+    out = io.StringIO()
+    exportiere([(adresse, termine)], "ical", out, mehrere=True, alarm=6, titel="Abfuhrtermine " + adresse)
+    text = out.getvalue()
+    zeilen = text.split("\r\n")
+    assert max(len(z.encode("utf-8")) for z in zeilen) <= 75
+    assert any(z.startswith(" ") for z in zeilen)
+    assert tage(iter_ical_events([text])) == [("2025-01-06", termine[0].typ)]
+    ungefaltet = text.replace("\r\n ", "")
+    assert f"LOCATION:{adresse.replace(',', chr(92) + ',')}\r\n" in ungefaltet
+    assert "".join(bamberg_muell.ical_lines(termine, adresse)).count("\r\n ") > 0
+
+
+# darstellung
+
+def zeilen_im_baum(app):
+    assert app._zeilen_ids == app.tree.get_children()
+    return [app.tree.werte[i] for i in app.tree.get_children()]
+
+
+def test_treeview_aktualisierung_wie_neu_dargestellt():
+    basis = [(f"2025-{1 + i // 4:02d}-{1 + i % 4 * 7:02d}", "Restmüll" if i % 2 else "Biomüll") for i in range(10)]
+    verschoben = basis[2:-1] + [("2025-03-29", basis[-1][1])]
+    app = headless_app()
+    for termine in (basis, basis[2:], verschoben, [], verschoben, basis):
+        app.zeige_termine(liste(*termine))
+        neu = headless_app()
+        neu.zeige_termine(liste(*termine))
+        assert zeilen_im_baum(app) == zeilen_im_baum(neu)
+
+
+# snapshot-cache
+
+def liste(*termine):
+    return TerminListe((date.fromisoformat(d), typ) for d, typ in termine)
+
+
+def test_snapshot_roundtrip(tmp_path):
+    path = str(tmp_path / "termine.snap")
+    snap = Snapshot(path)
+    termine = liste(("2025-01-06", "Restmüll"), ("2025-01-07", "Biomüll"))
+    snap.put("a|1|", termine, 100.0, 200.0)
+    snap.set_history([{'strasse': "A", 'hnr': "1", 'zusatz': ""}])
+    neu = Snapshot(path)
+    assert neu.termine("a|1|") == termine
+    assert neu.info("a|1|")[:3] == (100.0, 200.0, 2)
+    assert neu.history == [{'strasse': "A", 'hnr': "1", 'zusatz': ""}]
+
+
+def test_snapshot_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(bamberg_muell, "SNAPSHOT_COMPACT", 5)
+    path = str(tmp_path / "termine.snap")
+    snap = Snapshot(path)
+    for i in range(12):
+        snap.put(f"a|{i % 3}|", liste((f"2025-01-{i + 1:02d}", "Papier")), float(i), float(i))
+    snap.delete(["a|0|"])
+    assert snap._log <= 5
+    neu = Snapshot(path)
+    assert sorted(neu.keys()) == ["a|1|", "a|2|"]
+    assert neu.termine("a|2|") == liste(("2025-01-12", "Papier"))
+
+
+@pytest.mark.parametrize("schaden", ["kopf", "abgeschnitten", "muell"])
+def test_snapshot_beschaedigt_wird_neu_angelegt(tmp_path, schaden, capsys):
+    path = str(tmp_path / "termine.snap")
+    Snapshot(path).put("a|1|", liste(("2025-01-06", "Restmüll")), 1.0, 1.0)
+    data = bytearray(open(path, "rb").read())
+    if schaden == "kopf":
+        data = bamberg_muell._HEADER.pack(b"BMSN", 1, 0, 26, 10 ** 6) + b"\0" * 10
+    elif schaden == "abgeschnitten":
+        data = data[:bamberg_muell._HEADER.size + 3]
+    else:
+        data[bamberg_muell._HEADER.size:] = b"\xff" * (len(data) - bamberg_muell._HEADER.size)
+    open(path, "wb").write(data)
+    cache = TermineCache(path)
+    for key, _, _ in cache.entries():
+        cache.get(key)
+    cache.put("b|2|", liste(("2025-02-01", "Papier")))
+    assert TermineCache(path).get("b|2|")['termine'] == liste(("2025-02-01", "Papier"))
+
+
+# änderungen
+
+def test_diff_termine():
+    alt = liste(("2025-01-06", "Restmüll"), ("2025-01-07", "Biomüll"), ("2025-03-01", "Papier"))
+    neu = liste(("2025-01-08", "Restmüll"), ("2025-01-07", "Biomüll"), ("2025-05-01", "Papier"))
+    d = diff_termine(alt, neu)
+    assert [(a.datum, n.datum, a.typ) for a, n in d['verschoben']] == [("06.01.2025", "08.01.2025", "Restmüll")]
+    assert [(t.datum, t.typ) for t in d['entfallen']] == [("01.03.2025", "Papier")]
+    assert [(t.datum, t.typ) for t in d['neu']] == [("01.05.2025", "Papier")]
+    assert diff_termine(alt, alt) == {'neu': [], 'entfallen': [], 'verschoben': []}
+
+
+# circuit breaker
+
+def test_circuit_breaker_zustaende():
+    breaker = CircuitBreaker(schwelle=2, pause=0.05)
+    assert breaker.pruefen() is False
+    breaker.fehler()
+    breaker.pruefen()
+    breaker.fehler()
+    with pytest.raises(CircuitOpen):
+        breaker.pruefen()
+    time.sleep(0.06)
+    assert breaker.pruefen() is True  # halb offen: ein probeversuch
+    with pytest.raises(CircuitOpen):
+        breaker.pruefen()
+    breaker.fehler()  # probe gescheitert, wieder offen
+    with pytest.raises(CircuitOpen):
+        breaker.pruefen()
+    time.sleep(0.06)
+    assert breaker.pruefen() is True
+    breaker.erfolg()
+    assert breaker.pruefen() is False and not breaker.offen
+
+
+def test_circuit_breaker_probe_mit_unerwartetem_fehler(servlet, monkeypatch):
+    client = TermineClient(servlet.url, retries=0)
+    client.breaker = CircuitBreaker(schwelle=1, pause=0.01)
+    client.breaker.fehler()
+    time.sleep(0.02)
+    monkeypatch.setattr(client.session, "request", lambda *a, **k: (_ for _ in ()).throw(requests.TooManyRedirects()))
+    with pytest.raises(requests.TooManyRedirects):
+        client.handshake()
+    monkeypatch.undo()
+    time.sleep(0.02)
+    client.handshake()  # nicht dauerhaft "probeversuch läuft"
+    assert not client.breaker.offen
+
+
+def test_client_wiederholt_serverfehler():
+    server = FakeServlet(events=20, fehlerquote=0.3, seed=1).start()
+    try:
+        client = TermineClient(server.url, retries=10)
+        client.breaker = CircuitBreaker(schwelle=100)
+        assert len(client.get_termine("Am Kranen", 1)) == 20
+        assert server.fehler > 0
+    finally:
+        server.shutdown()
+
+
+def test_client_serverfehler_ohne_neuen_handshake(servlet):
+    client = TermineClient(servlet.url, retries=2)
+    client.breaker = CircuitBreaker(schwelle=100)
+    client.get_termine("Am Kranen", 1)
+    servlet.ausfall = True
+    vorher = servlet.requests
+    with pytest.raises(requests.HTTPError):
+        client.get_termine("Am Kranen", 2)
+    assert servlet.requests - vorher == 3
+
+
+@pytest.mark.parametrize("fehler, versuche", [
+    (bamberg_muell.FormRejected("abgelehnt"), 1),
+    (requests.HTTPError("404", response=type("Antwort", (), {'status_code': 404})()), 1),
+    (requests.ConnectionError("weg"), 3),
+])
+def test_sammelabruf_wiederholt_nur_voruebergehende_fehler(fehler, versuche, monkeypatch):
+    class Client:
+        def get_termine(self, *args):
+            raise fehler
+    monkeypatch.setattr(bamberg_muell, "_thread_client", lambda url: Client())
+    result = bamberg_muell._fetch_with_retry(("Am Kranen", "1", ""), "url", threading.Semaphore(), 2, 0)
+    assert result['versuche'] == versuche and result['fehler']
+
+
+# coalescer
+
+def test_coalescer_fasst_gleichzeitige_abrufe_zusammen():
+    coalescer = Coalescer()
+    aufrufe = []
+    los = threading.Event()
+
+    def abruf():
+        aufrufe.append(1)
+        los.wait(1)
+        return "termine"
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(coalescer.run, "a", abruf) for _ in range(4)]
+        time.sleep(0.1)
+        los.set()
+        assert [f.result() for f in futures] == ["termine"] * 4
+    assert len(aufrufe) == 1 and coalescer.zusammengefasst == 3
+
+
+def test_coalescer_reicht_fehler_weiter():
+    coalescer = Coalescer()
+    with pytest.raises(RuntimeError):
+        coalescer.run("a", lambda: (_ for _ in ()).throw(RuntimeError("weg")))
+    assert coalescer.run("a", lambda: 1) == 1
+
+
+def test_dienst_verwendet_clients_wieder(servlet, tmp_path):
+    # jede anfrage kommt in einem eigenen thread, wie beim ThreadingHTTPServer
+    service = TermineService(TermineCache(str(tmp_path / "termine.snap")), servlet.url, rate=1000)
+    for hnr in range(1, 6):
+        thread = threading.Thread(target=service.termine, args=("Am Kranen", str(hnr)))
+        thread.start()
+        thread.join()
+    assert servlet.requests == 1 + 5 * 3  # ein handshake für alle abrufe
+    service.close()
+
+
+@pytest.mark.parametrize("inhalt", [b'{"fehler": "Adresse unbekannt"}', b'{"error": 1}', b'[]', b'"kaputt"',
+                                    b'<html>Bad Gateway</html>'])
+def test_dienst_client_fehlerantworten(inhalt, monkeypatch):
+    antwort = requests.Response()
+    antwort.status_code, antwort._content, antwort.url = 502, inhalt, "http://dienst/termine"
+    client = bamberg_muell.ServiceClient("http://dienst")
+    monkeypatch.setattr(client.session, "get", lambda *args, **kwargs: antwort)
+    with pytest.raises(requests.HTTPError) as fehler:
+        client.abrufen("Am Kranen", "1")
+    assert fehler.value.response is antwort
+
+
+# lade_termine
+
+def test_lade_termine_frisch_cache_veraltet(servlet, tmp_path):
+    cache = TermineCache(str(tmp_path / "termine.snap"))
+    termine, _, quelle = lade_termine("Am Kranen", "1", "", cache, servlet.url)
+    assert quelle is None and len(termine) == 20
+    assert lade_termine("Am Kranen", "1", "", cache, servlet.url)[2] == "cache"
+
+    cache.put(TermineCache.key("Am Kranen", "1", ""), termine, time.time() - 2 * cache.ttl)
+    servlet.ausfall = True
+    termine_alt, stand, quelle = lade_termine("Am Kranen", "1", "", cache, servlet.url)
+    assert quelle == "veraltet" and termine_alt == termine and time.time() - stand > cache.ttl
+    with pytest.raises(requests.RequestException):
+        lade_termine("Am Kranen", "2", "", cache, servlet.url)
+
+
+def test_formularseite_statt_kalender_liefert_veraltete_termine(tmp_path):
+    server = FakeServlet(events=20, max_session_uses=0).start()
+    try:
+        cache = TermineCache(str(tmp_path / "termine.snap"))
+        termine = liste(("2025-01-06", "Restmüll"))
+        cache.put(TermineCache.key("Am Kranen", "1", ""), termine, time.time() - 2 * cache.ttl)
+        assert lade_termine("Am Kranen", "1", "", cache, server.url)[::2] == (termine, "veraltet")
+        service = TermineService(cache, server.url, rate=1000)
+        assert service.termine("Am Kranen", "1")[::2] == (termine, True)
+        with pytest.raises(bamberg_muell.FormRejected):
+            service.termine("Am Kranen", "2")
+        service.close()
+    finally:
+        server.shutdown()
+
+
+def test_abgelaufene_session_neuer_handshake(tmp_path):
+    server = FakeServlet(events=5, max_session_uses=1).start()
+    try:
+        client = TermineClient(server.url)
+        client.get_termine("Am Kranen", 1)
+        assert len(client.get_termine("Am Kranen", 2)) == 5
+    finally:
+        server.shutdown()
+
+
+def test_sync_verwendet_ort_aus_dem_index(tmp_path, monkeypatch, capsys):
+    orte = []
+
+    def get_termine(strasse, hnr, zusatz, url, ort):
+        orte.append(ort)
+        return liste(("2025-01-06", "Restmüll"))
+
+    class Index:
+        def ort(self, strasse):
+            return "K"
+
+    monkeypatch.setattr(bamberg_muell, "get_termine", get_termine)
+    monkeypatch.setattr(bamberg_muell, "offenes_index", lambda: Index())
+    args = argparse.Namespace(cache=str(tmp_path / "termine.snap"), strasse="Am Kranen", hnr="1", zusatz="",
+                              url="url")
+    assert bamberg_muell.cmd_sync(args) == 0
+    assert orte == ["K"] and "1 Termine neu geladen" in capsys.readouterr().out
+
+
+# erinnerungen
+
+def test_planer_stop_bricht_wartende_abrufe_ab(tmp_path, monkeypatch):
+    gestartet, weiter, orte = threading.Event(), threading.Event(), []
+
+    def get_termine(strasse, hnr, zusatz, url, ort):
+        orte.append(ort)
+        gestartet.set()
+        weiter.wait(5)
+        return liste(("2025-01-06", "Restmüll"))
+
+    class Index:
+        def ort(self, strasse):
+            return "K"
+
+    monkeypatch.setattr(bamberg_muell_erinnerung, "get_termine", get_termine)
+    planer = bamberg_muell_erinnerung.Planer(TermineCache(str(tmp_path / "termine.snap")), index=Index())
+    laufend = planer._abrufen({'strasse': "Am Kranen", 'hnr': "1", 'zusatz': ""})
+    assert gestartet.wait(5)
+    wartend = planer._abrufen({'strasse': "Am Kranen", 'hnr': "2", 'zusatz': ""})
+    planer.stop()
+    weiter.set()
+    assert wartend.cancelled() and len(laufend.result(5)) == 1
+    assert orte == ["K"]
+
+
+# abfallarten
+
+@pytest.fixture
+def abfallarten_datei(tmp_path):
+    path = tmp_path / "abfallarten.json"
+    yield path
+    bamberg_muell.lade_abfallarten(None)
+
+
+def test_abfallarten_aus_datei(abfallarten_datei):
+    abfallarten_datei.write_text('[{"id": "altglas", "name": "Altglas", "muster": ["Glas"], "hell": "#b2dfdb"}]',
+                                 encoding="utf-8")
+    bamberg_muell.lade_abfallarten(str(abfallarten_datei))
+    assert bamberg_muell.abfallart("Altglascontainer").id == "altglas"
+    assert bamberg_muell.abfallart("Restmüll").id == "restmuell"
+    assert bamberg_muell.abfallart("Irgendwas").id == "sonstige"
+
+
+def test_abfallarten_muster_als_text_abgelehnt(abfallarten_datei, capsys):
+    abfallarten_datei.write_text('[{"id": "altglas", "muster": "Glas"}]', encoding="utf-8")
+    bamberg_muell.lade_abfallarten(str(abfallarten_datei))
+    assert "ungültig" in capsys.readouterr().err
+    assert bamberg_muell.abfallart("Gelber Sack").id == "gelb"